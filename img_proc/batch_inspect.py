@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+
+import instrumentation
+from gear_reference import GearReference
+from img import inspect_sample, inspection_parameters
+from ingest import FrameStack, StackFrame, iter_images, read_gray
+from polar import PolarRing, inspect_sample_polar, polar_parameters
+from result_cache import ResultCache, cache_key, content_digest
+
+# Set once per worker process by init_worker, so the reference is loaded a single time per worker
+_reference = None
+_ring = None
+_masks_folder = None
+_prescreen_pixels = None
+_ship_metrics = False
+_cache = None
+_cache_prefix = None
+
+
+def init_worker(reference_path, masks_folder=None, mode="contour", prescreen_pixels=None, metrics=False,
+                ship_metrics=False, cache_path=None):
+    global _reference, _ring, _masks_folder, _prescreen_pixels, _ship_metrics, _cache, _cache_prefix
+    if metrics:
+        instrumentation.enable()
+    _ship_metrics = metrics and ship_metrics
+    _reference = GearReference.load_or_build(reference_path)
+    _ring = PolarRing(_reference) if mode == "polar" else None
+    _masks_folder = masks_folder
+    _prescreen_pixels = prescreen_pixels
+    _cache = None
+    if cache_path is not None:
+        # Each worker holds its own connection, SQLite serialises the writes between processes
+        _cache = ResultCache(cache_path)
+        if _ring is not None:
+            parameters = polar_parameters(_ring, prescreen_pixels=prescreen_pixels)
+        else:
+            parameters = inspection_parameters(prescreen_pixels)
+        _cache_prefix = (_reference.fingerprint(), parameters)
+
+
+def mask_path(name):
+    return os.path.join(_masks_folder, f"defect_localization_{name}")
+
+
+def inspect_path(path):
+    """Inspect one image file or ``StackFrame`` with the worker's reference and return its JSON-serialisable record.
+
+    The image is decoded once (stack frames not at all) and every stage reads the same array.
+    """
+    start = time.perf_counter()
+    record = {"path": path.path, "frame": path.index} if isinstance(path, StackFrame) else {"path": path}
+    try:
+        return inspect_record(path, record, start)
+    except Exception as error:
+        # One bad image becomes an error record instead of aborting the batch and its results in flight
+        return error_record(record, f"inspection failed: {error!r}", start)
+
+
+def inspect_record(path, record, start):
+    sample, data = None, None
+    if isinstance(path, StackFrame):
+        stack = FrameStack.open(path.path)
+        name, sample = stack.names[path.index], stack[path.index]
+        if _cache is not None:
+            image_digest = content_digest(sample)
+    else:
+        name = os.path.basename(path)
+        if _cache is not None:
+            try:
+                image_digest, data = _cache.file_digest(path)
+            except OSError as error:
+                return error_record(record, f"could not read image: {error.strerror}", start)
+
+    if _cache is not None:
+        key = cache_key(image_digest, *_cache_prefix)
+        cached = _cache.get(key)
+        # A hit skips decoding and analysis, and the mask write as long as the mask is still there
+        if cached is not None and (_masks_folder is None or os.path.exists(mask_path(name))):
+            return make_record(record, cached, start, cached=True)
+
+    if sample is None:
+        with instrumentation.stage("decode"):
+            sample = read_gray(path, data)
+        if sample is None:
+            return error_record(record, "could not read image", start)
+    if sample.shape != _reference.shape:
+        return error_record(record, f"image shape {sample.shape} does not match reference {_reference.shape}",
+                            start)
+
+    if _ring is not None:
+        result, defect_mask = inspect_sample_polar(_reference, _ring, sample, prescreen_pixels=_prescreen_pixels)
+    else:
+        result, defect_mask = inspect_sample(_reference, sample, prescreen_pixels=_prescreen_pixels)
+    if _masks_folder is not None:
+        with instrumentation.stage("write", pixels=defect_mask.size):
+            cv2.imwrite(mask_path(name), defect_mask)
+    if _cache is not None:
+        _cache.put(key, result)
+    return make_record(record, result, start, cached=False)
+
+
+def error_record(record, message, start):
+    record.update(status="error", error=message, seconds=time.perf_counter() - start)
+    return record
+
+
+def make_record(record, result, start, cached):
+    record.update(result)
+    record["status"] = result_status(result)
+    if _cache is not None:
+        record["cached"] = cached
+    record["seconds"] = time.perf_counter() - start
+    if _ship_metrics:
+        # Pool workers send this image's metrics back with the record, the parent merges them
+        record["_metrics"] = instrumentation.registry.snapshot(reset=True)
+    return record
+
+
+def result_status(result):
+    """A gear passes only without faulty teeth and with an inner opening within tolerance."""
+    if result["broken_teeth"] == 0 and result["worn_out_teeth"] == 0 and result["diameter_status"] == "Same":
+        return "pass"
+    return "fail"
+
+
+def run_batch(paths, reference_path, workers, max_in_flight, masks_folder=None, mode="contour",
+              prescreen_pixels=None, metrics=False, cache_path=None):
+    """Yield one record per image as soon as it finishes.
+
+    At most ``max_in_flight`` images are submitted at once, so memory stays flat for any number of paths.
+    Records are yielded in completion order, not input order.
+    With ``metrics`` the workers' stage metrics are merged into ``instrumentation.registry``.
+    With ``cache_path`` results are looked up in and added to that ``ResultCache`` file.
+    """
+    if workers <= 1:
+        init_worker(reference_path, masks_folder, mode, prescreen_pixels, metrics, cache_path=cache_path)
+        for path in paths:
+            yield inspect_path(path)
+        return
+
+    paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(reference_path, masks_folder, mode, prescreen_pixels,
+                                       metrics, True, cache_path)) as executor:
+        in_flight = set()
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < max_in_flight:
+                path = next(paths, None)
+                if path is None:
+                    exhausted = True
+                    break
+                in_flight.add(executor.submit(inspect_path, path))
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                worker_metrics = record.pop("_metrics", None)
+                if worker_metrics is not None:
+                    instrumentation.registry.merge(worker_metrics)
+                yield record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect gear images in parallel and stream one JSON record per gear")
+    parser.add_argument("inputs", nargs="+", help="image files, directories, glob patterns or .npy frame stacks")
+    parser.add_argument("--reference", default=os.path.join("samples", "ideal.jpg"),
+                        help="ideal gear image or precomputed .npz reference (default: samples/ideal.jpg)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: all cores)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="maximum images queued or being inspected at once (default: 4 per worker)")
+    parser.add_argument("--mode", choices=("contour", "polar"), default="contour",
+                        help="contour: full frame XOR and contour matching, polar: unwrapped tooth ring profile")
+    parser.add_argument("--prescreen", type=int, metavar="PIXELS", default=None,
+                        help="pass gears with at most this many differing tooth-ring pixels without tooth matching")
+    parser.add_argument("--metrics", metavar="FILE", default=None,
+                        help="record per-stage timings and dump them in Prometheus text format to FILE")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, metavar="SECONDS",
+                        help="how often the metrics file is rewritten (default: 10)")
+    parser.add_argument("--cache", metavar="FILE", default=None,
+                        help="SQLite result cache, unchanged images are answered from it without being inspected again")
+    parser.add_argument("--cache-max-mb", type=float, default=64.0,
+                        help="results kept in the cache, least recently used evicted first (default: 64)")
+    parser.add_argument("--output", default="-", help="JSONL file to write, '-' for stdout (default)")
+    parser.add_argument("--save-masks", metavar="FOLDER", default=None,
+                        help="also write defect_localization_<name> masks into this folder")
+    args = parser.parse_args(argv)
+
+    max_in_flight = args.max_in_flight or 4 * max(args.workers, 1)
+    if args.save_masks is not None:
+        os.makedirs(args.save_masks, exist_ok=True)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    dumper = None
+    if args.metrics is not None:
+        instrumentation.enable()
+        dumper = instrumentation.PeriodicDump(args.metrics, args.metrics_interval).start()
+    start = time.perf_counter()
+    count = 0
+    prescreened = 0
+    cached = 0
+    try:
+        for record in run_batch(iter_images(args.inputs), args.reference, args.workers, max_in_flight,
+                                args.save_masks, args.mode, args.prescreen, args.metrics is not None,
+                                args.cache):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            count += 1
+            if record.get("stage") == "prescreen":
+                prescreened += 1
+            if record.get("cached"):
+                cached += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if dumper is not None:
+            dumper.stop()
+
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Inspected {count} images in {elapsed:.2f} s ({rate:.1f} images/s)", file=sys.stderr)
+    if args.prescreen is not None and count > 0:
+        print(f"Prescreen decided {prescreened} of {count} ({100 * prescreened / count:.1f}%)", file=sys.stderr)
+    if args.cache is not None:
+        with ResultCache(args.cache, int(args.cache_max_mb * 2 ** 20)) as cache:
+            evicted = cache.evict()
+        print(f"Cache answered {cached} of {count}, evicted {evicted} results", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
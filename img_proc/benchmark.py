@@ -0,0 +1,168 @@
+import argparse
+import json
+import resource
+import sys
+import time
+import tracemalloc
+
+import cv2
+
+from gear_reference import GearReference
+from img import inspect_sample, sample_difference, inspect_teeth, inspect_diameter
+from polar import PolarRing, inspect_sample_polar
+from synthetic import generate_dataset
+
+
+def encode_dataset(dataset, jpeg_quality):
+    """JPEG-encode every synthetic gear so the benchmark includes decoding, like reading files would."""
+    encoded = []
+    for image, truth in dataset:
+        ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        encoded.append((buffer, truth))
+    return encoded
+
+
+def stage_times(stages, samples, repeat=1):
+    """Mean milliseconds of each named stage function, timed separately over every sample."""
+    totals = {}
+    for name, stage in stages:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for sample in samples:
+                stage(sample)
+        totals[name] = round((time.perf_counter() - start) * 1000 / (repeat * len(samples)), 4)
+    return totals
+
+
+def stage_peaks(stages, samples):
+    """Peak traced memory in MB of each named stage function over one pass, traced apart from the timing."""
+    peaks = {}
+    for name, stage in stages:
+        tracemalloc.start()
+        for sample in samples:
+            stage(sample)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks[name] = round(peak / 2 ** 20, 3)
+    return peaks
+
+
+def precision_recall(true_positive, false_positive, false_negative):
+    precision = true_positive / (true_positive + false_positive) if true_positive + false_positive else 1.0
+    recall = true_positive / (true_positive + false_negative) if true_positive + false_negative else 1.0
+    return {"precision": round(precision, 4), "recall": round(recall, 4),
+            "tp": true_positive, "fp": false_positive, "fn": false_negative}
+
+
+def score(results, truths):
+    """Precision/recall of faulty gears, broken and worn tooth counts, and diameter status accuracy."""
+    counts = {key: [0, 0, 0] for key in ("defective_gears", "broken_teeth", "worn_out_teeth", "faulty_teeth")}
+
+    def count(key, predicted, expected):
+        counts[key][0] += min(predicted, expected)
+        counts[key][1] += max(predicted - expected, 0)
+        counts[key][2] += max(expected - predicted, 0)
+
+    diameter_correct = 0
+    for result, truth in zip(results, truths):
+        broken, worn = len(truth["broken"]), len(truth["worn"])
+        count("broken_teeth", result["broken_teeth"], broken)
+        count("worn_out_teeth", result["worn_out_teeth"], worn)
+        count("faulty_teeth", result["broken_teeth"] + result["worn_out_teeth"], broken + worn)
+        count("defective_gears", int(result["broken_teeth"] + result["worn_out_teeth"] > 0), int(broken + worn > 0))
+        diameter_correct += result["diameter_status"] == truth["diameter_status"]
+
+    report = {key: precision_recall(*value) for key, value in counts.items()}
+    report["diameter_status_accuracy"] = round(diameter_correct / len(truths), 4) if truths else 1.0
+    return report
+
+
+def run_mode(mode, reference, encoded, prescreen_pixels=None, repeat=1):
+    ring = PolarRing(reference) if mode == "polar" else None
+
+    def inspect(sample):
+        if ring is not None:
+            return inspect_sample_polar(reference, ring, sample, prescreen_pixels=prescreen_pixels)
+        return inspect_sample(reference, sample, prescreen_pixels=prescreen_pixels)
+
+    # End to end throughput: decode then inspect every image, without tracemalloc slowing allocations down
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [inspect(cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE))[0] for buffer, truth in encoded]
+    elapsed = time.perf_counter() - start
+
+    # Memory in a separate, traced pass
+    tracemalloc.start()
+    for buffer, truth in encoded:
+        inspect(cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Per-stage breakdown, each stage timed on its own over the decoded images
+    samples = [cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE) for buffer, truth in encoded]
+    stages = [("decode", lambda index: cv2.imdecode(encoded[index][0], cv2.IMREAD_GRAYSCALE))]
+    if ring is not None:
+        stages += [
+            ("unwrap", lambda index: ring.strip(samples[index])),
+            ("tooth_loss", lambda index: ring.tooth_loss(ring.strip(samples[index]))),
+        ]
+    else:
+        differences = [sample_difference(reference, sample) for sample in samples]
+        stages += [
+            ("difference", lambda index: sample_difference(reference, samples[index])),
+            ("teeth", lambda index: inspect_teeth(reference, differences[index].copy())),
+        ]
+    stages += [
+        ("diameter", lambda index: inspect_diameter(reference, samples[index])),
+        ("inspect", lambda index: inspect(samples[index])),
+    ]
+
+    report = {
+        "mode": mode,
+        "images": len(encoded) * repeat,
+        "seconds": round(elapsed, 4),
+        "images_per_second": round(len(encoded) * repeat / elapsed, 2) if elapsed > 0 else 0.0,
+        "stage_ms": stage_times(stages, range(len(samples))),
+        "stage_peak_memory_mb": stage_peaks(stages, range(len(samples))),
+        "peak_traced_memory_mb": round(peak / 2 ** 20, 3),
+        "accuracy": score(results, [truth for buffer, truth in encoded]),
+    }
+    if prescreen_pixels is not None:
+        report["prescreened"] = sum(result["stage"] == "prescreen" for result in results)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Accuracy and throughput benchmark of the gear inspection on synthetic gears")
+    parser.add_argument("--count", type=int, default=200, help="number of synthetic gears (default: 200)")
+    parser.add_argument("--teeth", type=int, default=30)
+    parser.add_argument("--defect-rate", type=float, default=0.3, help="fraction of gears with faulty teeth")
+    parser.add_argument("--max-defects", type=int, default=4)
+    parser.add_argument("--bad-diameter-rate", type=float, default=0.1)
+    parser.add_argument("--noise", type=float, default=2.0, help="gaussian noise sigma in gray levels")
+    parser.add_argument("--jpeg-quality", type=int, default=90)
+    parser.add_argument("--mode", choices=("contour", "polar", "both"), default="both")
+    parser.add_argument("--prescreen", type=int, metavar="PIXELS", default=None)
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the dataset for the throughput timing")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    dataset = generate_dataset(args.count, args.seed, args.teeth, args.defect_rate, args.max_defects,
+                               args.bad_diameter_rate, args.noise, jpeg_quality=None)
+    encoded = encode_dataset(dataset, args.jpeg_quality)
+    ideal_buffer, _ = encoded.pop(0)
+    reference = GearReference.from_gray(cv2.imdecode(ideal_buffer, cv2.IMREAD_GRAYSCALE))
+
+    modes = ("contour", "polar") if args.mode == "both" else (args.mode,)
+    report = {
+        "dataset": {"count": args.count, "teeth": args.teeth, "defect_rate": args.defect_rate,
+                    "noise": args.noise, "jpeg_quality": args.jpeg_quality, "seed": args.seed},
+        "modes": [run_mode(mode, reference, encoded, args.prescreen, args.repeat) for mode in modes],
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import hashlib
+
+import cv2
+import numpy as np
+
+# Using a threshold of 30 removes most of the noise when creating the binary mask
+THRESHOLD = 30
+
+# The two black circles drawn at (cx - 6, cy) and (cx + 6, cy) remove everything except the teeth
+HUB_RADIUS = 165
+HUB_OFFSET = 6
+
+# Erosion kernel used to remove noise and the connection between neighbouring teeth
+KERNEL = np.ones((3, 3), np.uint8)
+
+
+# Function defined to find the centre of any contour then return its x and y coordinates as a tuple
+def findCentre(contour):
+    M = cv2.moments(contour)
+    area = M['m00']
+    if area == 0:
+        # Degenerate contours (single pixels or lines) have no area, fall back to the mean point
+        cx, cy = np.asarray(contour).reshape(-1, 2).mean(axis=0)
+        return (int(cx), int(cy))
+    cx = int(M['m10'] / M['m00'])
+    cy = int(M['m01'] / M['m00'])
+    return (cx, cy)
+
+
+def mask_hub(image, centre):
+    """Draw the two black hub circles in place so only the teeth ring is left."""
+    cx, cy = centre
+    cv2.circle(image, (cx - HUB_OFFSET, cy), HUB_RADIUS, (0, 0, 0), -1)
+    cv2.circle(image, (cx + HUB_OFFSET, cy), HUB_RADIUS, (0, 0, 0), -1)
+    return image
+
+
+def mask_outside_opening(image, centre):
+    """Draw one thick black circle in place so only the centre part of the gear is left."""
+    cv2.circle(image, centre, 300, (0, 0, 0), 500)
+    return image
+
+
+# The thick circle above leaves only the pixels closer than 300 - 500 / 2 to the centre
+OPENING_RADIUS = 50
+
+
+class GearReference:
+    """Everything derived from the ideal gear image that does not depend on the sample.
+
+    Build it once with ``from_image`` (or ``from_gray``), then reuse it for every sample.
+    ``save``/``load`` keep it in a compact ``.npz`` so workers can start without ``ideal.jpg``.
+    """
+
+    def __init__(self, ideal_threshold, centre, ideal_teeth_erosion, teeth_contours,
+                 inner_contour=None):
+        self.ideal_threshold = ideal_threshold
+        self.centre = (int(centre[0]), int(centre[1]))
+        self.ideal_teeth_erosion = ideal_teeth_erosion
+        self.teeth_contours = list(teeth_contours)
+        self.teeth_centres = np.array([findCentre(c) for c in self.teeth_contours], dtype=np.int32).reshape(-1, 2)
+        self.teeth_areas = np.array([cv2.contourArea(c) for c in self.teeth_contours], dtype=np.float64)
+        self.inner_contour = inner_contour
+        self.inner_area = cv2.contourArea(inner_contour) if inner_contour is not None else 0.0
+        self._build_opening_mask()
+
+    def _build_opening_mask(self):
+        """Precompute the part of ``mask_outside_opening`` that is not black, cropped to its bounding box."""
+        cx, cy = self.centre
+        height, width = self.shape
+        margin = OPENING_RADIUS + 2
+        x0, y0 = max(cx - margin, 0), max(cy - margin, 0)
+        x1, y1 = min(cx + margin + 1, width), min(cy + margin + 1, height)
+        self.opening_roi = (slice(y0, y1), slice(x0, x1))
+        self.opening_mask = mask_outside_opening(np.full((y1 - y0, x1 - x0), 255, np.uint8), (cx - x0, cy - y0))
+
+    @property
+    def shape(self):
+        return self.ideal_threshold.shape
+
+    def fingerprint(self):
+        """Hex digest identifying the reference model, the same for an image and its saved ``.npz``."""
+        digest = hashlib.sha256()
+        digest.update(np.array(self.centre + self.shape, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(self.ideal_threshold).tobytes())
+        digest.update(np.ascontiguousarray(self.ideal_teeth_erosion).tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def from_image(cls, path):
+        ideal_image = cv2.imread(path)
+        if ideal_image is None:
+            raise FileNotFoundError(f"Could not read ideal image: {path}")
+        return cls.from_gray(cv2.cvtColor(ideal_image, cv2.COLOR_BGR2GRAY))
+
+    @classmethod
+    def from_gray(cls, ideal):
+        # Create thresholded binary mask of the ideal image
+        ret, ideal_threshold = cv2.threshold(ideal, THRESHOLD, 255, cv2.THRESH_BINARY)
+        centre = findCentre(ideal_threshold)
+
+        # Get the binary image of the ideal teeth
+        ideal_teeth = mask_hub(ideal.copy(), centre)
+        ret, ideal_teeth_threshold = cv2.threshold(ideal_teeth, THRESHOLD, 255, cv2.THRESH_BINARY)
+        ideal_teeth_erosion = cv2.erode(ideal_teeth_threshold, KERNEL, iterations=1)
+        teeth_contours, _ = cv2.findContours(ideal_teeth_erosion, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+
+        # Inverse thresholding makes the inner opening white so its contour can be found
+        ret, ideal_diameter_threshold = cv2.threshold(ideal, THRESHOLD, 255, cv2.THRESH_BINARY_INV)
+        mask_outside_opening(ideal_diameter_threshold, centre)
+        inner_contours, _ = cv2.findContours(ideal_diameter_threshold, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        inner_contour = inner_contours[0] if len(inner_contours) > 0 else None
+
+        return cls(ideal_threshold, centre, ideal_teeth_erosion, teeth_contours, inner_contour)
+
+    def save(self, path):
+        """Save the reference as a compressed ``.npz``; contours are stored flattened with offsets."""
+        lengths = np.array([len(c) for c in self.teeth_contours], dtype=np.int64)
+        points = (np.concatenate(self.teeth_contours).reshape(-1, 2) if len(self.teeth_contours) > 0
+                  else np.empty((0, 2), np.int32))
+        inner = (self.inner_contour.reshape(-1, 2) if self.inner_contour is not None
+                 else np.empty((0, 2), np.int32))
+        np.savez_compressed(
+            path,
+            ideal_threshold=self.ideal_threshold,
+            centre=np.array(self.centre, dtype=np.int32),
+            ideal_teeth_erosion=self.ideal_teeth_erosion,
+            teeth_points=points.astype(np.int32),
+            teeth_lengths=lengths,
+            inner_contour=inner.astype(np.int32),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            offsets = np.cumsum(data["teeth_lengths"])[:-1]
+            points = data["teeth_points"].reshape(-1, 1, 2)
+            teeth_contours = np.split(points, offsets) if len(data["teeth_lengths"]) > 0 else []
+            inner = data["inner_contour"]
+            inner_contour = inner.reshape(-1, 1, 2) if len(inner) > 0 else None
+            return cls(data["ideal_threshold"], tuple(data["centre"]), data["ideal_teeth_erosion"],
+                       teeth_contours, inner_contour)
+
+    @classmethod
+    def load_or_build(cls, path):
+        """Load a saved ``.npz`` reference, or derive it from an ideal image."""
+        if str(path).endswith(".npz"):
+            return cls.load(path)
+        return cls.from_image(path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute the ideal gear reference model into a .npz file")
+    parser.add_argument("ideal", help="path to the ideal gear image")
+    parser.add_argument("output", help="path of the .npz file to write")
+    args = parser.parse_args()
+
+    reference = GearReference.from_image(args.ideal)
+    reference.save(args.output)
+    print(f"Saved reference with {len(reference.teeth_contours)} teeth, centre {reference.centre} to {args.output}")
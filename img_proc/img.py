@@ -2,37 +2,30 @@ import cv2
 import numpy as np
 import os
 
-# Function defined to find the centre of any contour then return its x and y coordinates as a tuple
-def findCentre(contour):
-    M = cv2.moments(contour)
-    area = M['m00']
-    cx = int(M['m10'] / M['m00'])
-    cy = int(M['m01'] / M['m00'])
-    return (cx, cy)
+from gear_reference import (GearReference, mask_hub,
+                            THRESHOLD, KERNEL, HUB_RADIUS, OPENING_RADIUS)
+from ingest import read_gray
+from instrumentation import stage
+from result_cache import ResultCache, cache_key
 
 # Define paths
 samples_folder = "samples/"
 extracted_samples_folder = "extracted_samples/"
-os.makedirs(extracted_samples_folder, exist_ok=True)
 ideal_image_path = os.path.join(samples_folder, "ideal.jpg")
 
-# Read the ideal image
-ideal_image = cv2.imread(ideal_image_path)
-ideal = cv2.cvtColor(ideal_image, cv2.COLOR_BGR2GRAY)
-
-# Create thresholded binary mask of the ideal image
-ret, ideal_threshold = cv2.threshold(ideal, 30, 255, cv2.THRESH_BINARY)
-
 # Ideal diameter radius in pixels (assumed from comments)
 ideal_radius = 25
 ideal_area = np.pi * ideal_radius ** 2
 
+# Inner diameter area tolerance and the faulty / ideal tooth area ratio below which a tooth is worn out
+tolerance = 0.05  # 5% tolerance
+worn_ratio = 0.85
+
 def diameter_status(area):
     """Determine if the sample's inner diameter is larger, smaller, or the same compared to the ideal."""
-    tolerance = 0.05  # 5% tolerance
     lower_limit = ideal_area * (1 - tolerance)
     upper_limit = ideal_area * (1 + tolerance)
-    
+
     if area < lower_limit:
         return "Smaller"
     elif area > upper_limit:
@@ -40,105 +33,215 @@ def diameter_status(area):
     else:
         return "Same"
 
-# Process each sample image
-for idx, sample_image_name in enumerate(["sample2.jpg", "sample3.jpg", "sample4.jpg", "sample5.jpg", "sample6.jpg"], start=2):
-    sample_image_path = os.path.join(samples_folder, sample_image_name)
-    sample = cv2.imread(sample_image_path, cv2.IMREAD_GRAYSCALE)
-
-    # Create thresholded binary mask for the sample image
-    ret, sample_threshold = cv2.threshold(sample, 30, 255, cv2.THRESH_BINARY)
-
-    # Get the binary image of the ideal teeth
-    ideal_teeth = cv2.cvtColor(ideal_image, cv2.COLOR_BGR2GRAY)
-    cx, cy = findCentre(ideal_threshold)
-    cv2.circle(ideal_teeth, (cx - 6, cy), 165, (0, 0, 0), -1)
-    cv2.circle(ideal_teeth, (cx + 6, cy), 165, (0, 0, 0), -1)
-    ret, ideal_teeth_threshold = cv2.threshold(ideal_teeth, 30, 255, cv2.THRESH_BINARY)
-    ideal_teeth_erosion = cv2.erode(ideal_teeth_threshold, np.ones((3, 3), np.uint8), iterations=1)
-    contours_ideal_teeth, _ = cv2.findContours(ideal_teeth_erosion, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-
-    # Find the difference between the ideal mask and the sample mask to get faulty parts
-    difference = cv2.bitwise_xor(ideal_threshold, sample_threshold)
-    cv2.circle(difference, (cx - 6, cy), 165, (0, 0, 0), -1)
-    cv2.circle(difference, (cx + 6, cy), 165, (0, 0, 0), -1)
-    difference_erosion = cv2.erode(difference, np.ones((3, 3), np.uint8), iterations=1)
-    contours_difference, _ = cv2.findContours(difference_erosion, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-
-    # Draw bounding circles for each faulty tooth and match with ideal teeth
-    contours_difference_centres = []
-    for c in contours_difference:
-        cx, cy = findCentre(c)
-        cv2.circle(difference_erosion, (cx, cy), 22, (255, 255, 255), -1)
-        contours_difference_centres.append((cx, cy))
-
-    ideal_teeth_filtered = cv2.bitwise_and(difference_erosion, ideal_teeth_erosion)
-    contours_ideal_teeth_filtered, _ = cv2.findContours(ideal_teeth_filtered, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-
-    contours_ideal_teeth_filtered_centres = []
-    for c in contours_ideal_teeth_filtered:
-        cx, cy = findCentre(c)
-        contours_ideal_teeth_filtered_centres.append((cx, cy))
-
-    contours_ideal_teeth_matched = []
-    count = 0
-    for i in contours_difference_centres:
-        diff_x, diff_y = i
-        for j in contours_ideal_teeth_filtered_centres:
-            ideal_x, ideal_y = j
-            centre_distance = ((ideal_x - diff_x) ** 2 + (ideal_y - diff_y) ** 2) ** 0.5
-            if centre_distance < 20:
-                contours_ideal_teeth_matched.append(contours_ideal_teeth_filtered[count])
-                break
-            count += 1
-        count = 0
-
-    worn_out_teeth = 0
-    broken_teeth = 0
-
-    for i in range(len(contours_difference)):
-        area_difference = cv2.contourArea(contours_difference[i])
-        if i < len(contours_ideal_teeth_matched):
-            area_ideal = cv2.contourArea(contours_ideal_teeth_matched[i])
-            if area_difference / area_ideal < 0.85:
-                worn_out_teeth += 1
-            else:
-                broken_teeth += 1
-
-    # Inner diameter verification
-    sample_diameter_path = os.path.join(samples_folder, sample_image_name)
-    sample_image = cv2.imread(sample_diameter_path, cv2.IMREAD_GRAYSCALE)
-    ideal_diameter = cv2.cvtColor(ideal_image, cv2.COLOR_BGR2GRAY)
-    ret, ideal_diameter_threshold = cv2.threshold(ideal_diameter, 30, 255, cv2.THRESH_BINARY_INV)
-    ret, sample_threshold = cv2.threshold(sample_image, 30, 255, cv2.THRESH_BINARY_INV)
-    cv2.circle(ideal_diameter_threshold, (cx, cy), 300, (0, 0, 0), 500)
-    cv2.circle(sample_threshold, (cx, cy), 300, (0, 0, 0), 500)
-    contours_ideal_diameter, _ = cv2.findContours(ideal_diameter_threshold, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-    contours_sample, _ = cv2.findContours(sample_threshold, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-
-    diameter_status_text = ""
-    if len(contours_sample) > 0:
-        sample_area = cv2.contourArea(contours_sample[0])
-        sample_radius = np.sqrt(sample_area / np.pi)
-        sample_diameter = 2 * sample_radius
-        status = diameter_status(sample_area)
-        diameter_status_text = f"{sample_diameter:.2f} mm - {status} inner opening"
+def inspect_sample(reference, sample, prescreen_pixels=None):
+    """Run the sample-dependent steps against a precomputed ``GearReference``.
+
+    ``sample`` is a grayscale image. Returns the result dict and the defect localization mask.
+    With ``prescreen_pixels`` set, a sample whose eroded difference inside the tooth ring has at most
+    that many pixels is passed by the prescreen without the tooth matching. ``result["stage"]``
+    records whether the "prescreen" or the "full" analysis decided the teeth.
+    """
+    difference_erosion = sample_difference(reference, sample)
+
+    # Fast-reject: when hardly any pixel of the tooth ring differs, there is nothing to match
+    with stage("prescreen", pixels=difference_erosion.size):
+        changed_pixels = cv2.countNonZero(difference_erosion)
+    if prescreen_pixels is not None and changed_pixels <= prescreen_pixels:
+        decided_by = "prescreen"
+        defects, broken_teeth, worn_out_teeth = 0, 0, 0
+    else:
+        decided_by = "full"
+        defects, broken_teeth, worn_out_teeth = inspect_teeth(reference, difference_erosion)
+
+    inner_diameter, status = inspect_diameter(reference, sample)
+
+    result = {
+        "defects": defects,
+        "broken_teeth": broken_teeth,
+        "worn_out_teeth": worn_out_teeth,
+        "inner_diameter": inner_diameter,
+        "diameter_status": status,
+        "stage": decided_by,
+        "changed_pixels": changed_pixels,
+    }
+    result["description"] = describe(result)
+    return result, difference_erosion
+
+def sample_difference(reference, sample):
+    """Eroded XOR of the ideal and sample masks inside the tooth ring, i.e. the faulty parts."""
+    with stage("threshold", pixels=sample.size):
+        # Create thresholded binary mask for the sample image
+        ret, sample_threshold = cv2.threshold(sample, THRESHOLD, 255, cv2.THRESH_BINARY)
+
+        # Find the difference between the ideal mask and the sample mask to get faulty parts
+        difference = cv2.bitwise_xor(reference.ideal_threshold, sample_threshold)
+        mask_hub(difference, reference.centre)
+
+    with stage("erode", pixels=difference.size):
+        return cv2.erode(difference, KERNEL, iterations=1)
+
+def inspect_teeth(reference, difference_erosion):
+    """Match the faulty blobs to the ideal teeth. Returns (defects, broken, worn out).
+
+    The bounding circle of every faulty tooth is drawn into ``difference_erosion`` in place.
+    """
+    with stage("components", pixels=2 * difference_erosion.size) as record:
+        defect_centres, defect_labelling = label_blobs(difference_erosion)
+
+        # Draw bounding circles for each faulty tooth and match with ideal teeth
+        for cx, cy in defect_centres:
+            cv2.circle(difference_erosion, (int(cx), int(cy)), 22, (255, 255, 255), -1)
+
+        ideal_teeth_filtered = cv2.bitwise_and(difference_erosion, reference.ideal_teeth_erosion)
+        ideal_centres, ideal_labelling = label_blobs(ideal_teeth_filtered)
+        record.contours(len(defect_centres))
+
+    with stage("matching"):
+        broken_teeth, worn_out_teeth = classify_teeth(defect_centres, defect_labelling, ideal_centres, ideal_labelling)
+    return len(defect_centres), broken_teeth, worn_out_teeth
+
+def inspect_diameter(reference, sample):
+    """Inner diameter verification, masked around the reference centre. Returns (diameter, status).
+
+    Only the small box around the opening is thresholded, then masked with the precomputed opening mask,
+    which leaves the same pixels as drawing ``mask_outside_opening`` over the whole frame.
+    """
+    with stage("diameter", pixels=reference.opening_mask.size) as record:
+        ret, sample_threshold = cv2.threshold(sample[reference.opening_roi], THRESHOLD, 255, cv2.THRESH_BINARY_INV)
+        sample_threshold = cv2.bitwise_and(sample_threshold, reference.opening_mask)
+        contours_sample, _ = cv2.findContours(sample_threshold, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        record.contours(len(contours_sample))
+
+    if len(contours_sample) == 0:
+        return None, None
+    sample_area = cv2.contourArea(contours_sample[0])
+    sample_radius = np.sqrt(sample_area / np.pi)
+    return float(2 * sample_radius), diameter_status(sample_area)
+
+def label_blobs(mask):
+    """Centres (as int x, y) of every blob in a binary mask from one labelling pass, and the labelling.
+
+    Only the bounding box of the white pixels is labelled. The labelling is the (labels, stats) pair
+    ``blob_areas`` needs, blob ``i`` having label ``i + 1``.
+    """
+    x, y, w, h = cv2.boundingRect(mask)
+    if w == 0 or h == 0:
+        return np.empty((0, 2), np.int32), (None, np.empty((0, 5), np.int32))
+    roi = mask[y:y + h, x:x + w]
+    n, labels, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(roi, 8, cv2.CV_32S, cv2.CCL_BBDT)
+    # Label 0 is the background
+    centres = (centroids[1:] + (x, y)).astype(np.int32)
+    return centres, (labels, stats[1:])
+
+def blob_areas(labelling, blobs):
+    """cv2.contourArea of the external contour of each of the given blobs.
+
+    Every blob is traced on its own bounding box cut out of the labels, so only the few blobs
+    that are compared are traced, and never over the whole frame.
+    """
+    labels, stats = labelling
+    areas = np.empty(len(blobs), np.float64)
+    for i, blob in enumerate(blobs):
+        x, y, w, h = stats[blob, :4]
+        # A one pixel black margin, so the contour of the blob is traced like in the full mask
+        blob_mask = cv2.copyMakeBorder((labels[y:y + h, x:x + w] == blob + 1).astype(np.uint8),
+                                       1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+        contours, _ = cv2.findContours(blob_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        areas[i] = sum(cv2.contourArea(contour) for contour in contours)
+    return areas
+
+def match_teeth(defect_centres, ideal_centres, max_distance=20):
+    """Index of the nearest ideal tooth centre for every defect centre, or -1 if none is closer than max_distance."""
+    if len(defect_centres) == 0 or len(ideal_centres) == 0:
+        return np.full(len(defect_centres), -1, dtype=np.intp)
+    # Squared centre distance between every faulty tooth and every ideal tooth at once
+    delta = defect_centres[:, None, :].astype(np.int64) - ideal_centres[None, :, :]
+    distance_squared = (delta ** 2).sum(axis=2)
+    nearest = distance_squared.argmin(axis=1)
+    matched = distance_squared[np.arange(len(defect_centres)), nearest] < max_distance ** 2
+    return np.where(matched, nearest, -1)
+
+def classify_teeth(defect_centres, defect_labelling, ideal_centres, ideal_labelling, worn_ratio=worn_ratio):
+    """Count (broken, worn out) teeth by comparing each faulty area to its matched ideal tooth area.
+
+    As before, the matched ideal teeth are paired with the faulty teeth in order, so a faulty tooth
+    without a match shifts the pairing and the last faulty teeth are left unclassified. Only the
+    blobs of these pairs are traced for their contour areas.
+    """
+    matched = match_teeth(defect_centres, ideal_centres)
+    matched = matched[matched >= 0]
+    paired = len(matched)
+    if paired == 0:
+        return 0, 0
+    defect_areas = blob_areas(defect_labelling, range(paired))
+    # A degenerate ideal blob has a zero contour area, which must not divide
+    ideal_areas = np.maximum(blob_areas(ideal_labelling, matched), 0.5)
+    # A faulty area much smaller than the ideal tooth means the tooth is worn out, otherwise broken
+    worn = int(np.count_nonzero(defect_areas / ideal_areas < worn_ratio))
+    return paired - worn, worn
+
+def describe(result):
+    """Generate the human readable description for one inspection result."""
+    if result["inner_diameter"] is not None:
+        diameter_status_text = f"{result['inner_diameter']:.2f} mm - {result['diameter_status']} inner opening"
     else:
         diameter_status_text = "No inner diameter detected"
 
-    # Generate description for the current sample
     description_parts = []
-    if len(contours_difference) > 0:
-        if broken_teeth > 0:
-            description_parts.append(f"Broken teeth: {broken_teeth}")
-        if worn_out_teeth > 0:
-            description_parts.append(f"Worn out teeth: {worn_out_teeth}")
+    if result["defects"] > 0:
+        if result["broken_teeth"] > 0:
+            description_parts.append(f"Broken teeth: {result['broken_teeth']}")
+        if result["worn_out_teeth"] > 0:
+            description_parts.append(f"Worn out teeth: {result['worn_out_teeth']}")
 
     description_parts.append(diameter_status_text)
-    description = " + ".join(description_parts) if description_parts else "No defects detected"
-
-    # Print results
-    print(f"Sample {idx}: {description}")
-
-    # Save the images
-    result_image_path = os.path.join(extracted_samples_folder, f"defect_localization_{sample_image_name}")
-    cv2.imwrite(result_image_path, difference_erosion)
+    return " + ".join(description_parts) if description_parts else "No defects detected"
+
+def inspection_parameters(prescreen_pixels=None):
+    """Every setting the contour inspection result depends on, part of the result cache key."""
+    return {
+        "mode": "contour",
+        "threshold": THRESHOLD,
+        "hub_radius": HUB_RADIUS,
+        "opening_radius": OPENING_RADIUS,
+        "ideal_radius": ideal_radius,
+        "tolerance": tolerance,
+        "worn_ratio": worn_ratio,
+        "prescreen_pixels": prescreen_pixels,
+    }
+
+def main():
+    os.makedirs(extracted_samples_folder, exist_ok=True)
+
+    # Build the reference model once, every sample is compared against it
+    reference = GearReference.from_image(ideal_image_path)
+    reference_digest = reference.fingerprint()
+    parameters = inspection_parameters()
+
+    # Unchanged samples are answered from the cache without decoding, analysing or rewriting them
+    with ResultCache(os.path.join(extracted_samples_folder, "inspection_cache.sqlite")) as cache:
+        # Process each sample image
+        for idx, sample_image_name in enumerate(["sample2.jpg", "sample3.jpg", "sample4.jpg", "sample5.jpg", "sample6.jpg"], start=2):
+            sample_image_path = os.path.join(samples_folder, sample_image_name)
+            result_image_path = os.path.join(extracted_samples_folder, f"defect_localization_{sample_image_name}")
+            image_digest, data = cache.file_digest(sample_image_path)
+            key = cache_key(image_digest, reference_digest, parameters)
+            result = cache.get(key)
+
+            if result is None or not os.path.exists(result_image_path):
+                # Decoded once, the teeth and the diameter checks both read this array
+                sample = read_gray(sample_image_path, data)
+
+                result, difference_erosion = inspect_sample(reference, sample)
+
+                # Save the images
+                with stage("write", pixels=difference_erosion.size):
+                    cv2.imwrite(result_image_path, difference_erosion)
+                cache.put(key, result)
+
+            # Print results
+            print(f"Sample {idx}: {result['description']}")
+        cache.evict()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Decode every image once into a read-only grayscale array shared by all analysis stages.
+
+Images come from files (JPEG, PNG, ...) or from frame stacks: batches of frames decoded ahead of
+time and packed into one ``.npy`` file, plus a ``.names.txt`` file with the original file names.
+Stacks are opened memory-mapped, so repeat inspections and parameter sweeps skip decoding and
+worker processes share the stack's pages instead of each holding a copy.
+"""
+import argparse
+import collections
+import functools
+import glob
+import os
+import sys
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+STACK_EXTENSION = ".npy"
+
+# One frame of a frame stack, yielded by iter_images in place of a file path
+StackFrame = collections.namedtuple("StackFrame", ["path", "index"])
+
+
+def read_only(image):
+    if image is not None:
+        image.flags.writeable = False
+    return image
+
+
+def read_gray(path, data=None):
+    """Decode an image file as grayscale, from ``data`` when its bytes were already read.
+
+    Returns a read-only array, or None when the image cannot be decoded.
+    """
+    if data is None:
+        return read_only(cv2.imread(path, cv2.IMREAD_GRAYSCALE))
+    return read_only(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE))
+
+
+def names_path(path):
+    return os.path.splitext(path)[0] + ".names.txt"
+
+
+class FrameStack:
+    """Grayscale frames of one size stored as an (N, height, width) uint8 ``.npy`` file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.frames = np.load(path, mmap_mode="r")
+        if self.frames.ndim != 3 or self.frames.dtype != np.uint8:
+            raise ValueError(f"{path} is not a stack of uint8 grayscale frames")
+        try:
+            with open(names_path(path)) as file:
+                self.names = [line.rstrip("\n") for line in file]
+        except FileNotFoundError:
+            self.names = [f"frame{index}.png" for index in range(len(self.frames))]
+        if len(self.names) != len(self.frames):
+            raise ValueError(f"{names_path(path)} does not list one name per frame")
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def open(cls, path):
+        """Memory-map a stack once per process, later calls return the same instance."""
+        return cls(path)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    @classmethod
+    def pack(cls, paths, path):
+        """Decode every image in ``paths`` once and write them into a new stack at ``path``.
+
+        All images must decode and share one size. The frames are written straight into the
+        memory-mapped file, so packing needs memory for a single decoded image only.
+        """
+        paths = list(paths)
+        if not paths:
+            raise ValueError("No images to pack")
+        first = read_gray(paths[0])
+        if first is None:
+            raise ValueError(f"Could not read image: {paths[0]}")
+        frames = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(len(paths),) + first.shape)
+        frames[0] = first
+        for index, image_path in enumerate(paths[1:], start=1):
+            image = read_gray(image_path)
+            if image is None:
+                raise ValueError(f"Could not read image: {image_path}")
+            if image.shape != first.shape:
+                raise ValueError(f"Image shape {image.shape} of {image_path} does not match {first.shape}")
+            frames[index] = image
+        frames.flush()
+        del frames
+        with open(names_path(path), "w") as file:
+            file.writelines(os.path.basename(image_path) + "\n" for image_path in paths)
+        return cls(path)
+
+
+def iter_images(inputs):
+    """Lazily yield image paths from directories, globs or plain file paths, in sorted order per input.
+
+    A ``.npy`` frame stack given as an input yields one ``StackFrame`` per frame instead.
+    """
+    for item in inputs:
+        if item.lower().endswith(STACK_EXTENSION) and os.path.isfile(item):
+            for index in range(len(FrameStack.open(item))):
+                yield StackFrame(item, index)
+        elif os.path.isdir(item):
+            names = sorted(entry.name for entry in os.scandir(item) if entry.is_file())
+            for name in names:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(item, name)
+        elif glob.has_magic(item):
+            for path in sorted(glob.iglob(item, recursive=True)):
+                if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                    yield path
+        else:
+            yield item
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack gear images into a memory-mapped .npy frame stack")
+    parser.add_argument("stack", help="output .npy file, the frame names go to <stack>.names.txt")
+    parser.add_argument("inputs", nargs="+", help="image files, directories or glob patterns")
+    args = parser.parse_args(argv)
+
+    stack = FrameStack.pack(iter_images(args.inputs), args.stack)
+    count, height, width = stack.frames.shape
+    print(f"Packed {count} frames of {width}x{height} into {args.stack}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
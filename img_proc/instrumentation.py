@@ -0,0 +1,236 @@
+"""Opt-in per-stage timing and counters for the inspection pipeline.
+
+Wrap a stage with the ``stage`` context manager or the ``timed`` decorator::
+
+    with stage("erode", pixels=mask.size) as record:
+        ...
+        record.contours(len(contours))
+
+Nothing is recorded until ``enable()`` is called. While disabled, ``stage`` hands back one shared
+no-op object, so an instrumented stage costs a global check and two empty method calls.
+``render()`` returns the collected metrics in the Prometheus text exposition format and
+``PeriodicDump`` writes them to a file every few seconds.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+
+SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+CONTOUR_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+_enabled = False
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def state(self):
+        return [list(self.counts), self.sum, self.count]
+
+    def merge(self, state):
+        counts, total, count = state
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.sum += total
+        self.count += count
+
+
+class Registry:
+    """Histograms and counters keyed by (metric name, stage); safe to update from several threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, stage_name, value, buckets):
+        with self.lock:
+            key = (name, stage_name)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def add(self, name, stage_name, value):
+        with self.lock:
+            key = (name, stage_name)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def snapshot(self, reset=False):
+        """Plain picklable copy of every metric, optionally clearing them (to ship deltas between processes)."""
+        with self.lock:
+            snapshot = {
+                "histograms": {key: (histogram.buckets, histogram.state()) for key, histogram in self.histograms.items()},
+                "counters": dict(self.counters),
+            }
+            if reset:
+                self.histograms = {}
+                self.counters = {}
+        return snapshot
+
+    def merge(self, snapshot):
+        with self.lock:
+            for key, (buckets, state) in snapshot["histograms"].items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(buckets)
+                histogram.merge(state)
+            for key, value in snapshot["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def render(self):
+        snapshot = self.snapshot()
+        lines = []
+        described = set()
+        for (name, stage_name), (buckets, (counts, total, count)) in sorted(snapshot["histograms"].items()):
+            if name not in described:
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                described.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{stage="{stage_name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage_name}"}} {total}')
+            lines.append(f'{name}_count{{stage="{stage_name}"}} {count}')
+        for (name, stage_name), value in sorted(snapshot["counters"].items()):
+            if name not in described:
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                described.add(name)
+            lines.append(f'{name}{{stage="{stage_name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+HELP = {
+    "gear_stage_seconds": "Wall time of one pipeline stage.",
+    "gear_stage_pixels_total": "Pixels processed by a pipeline stage.",
+    "gear_stage_contours": "Contours or blobs found by a pipeline stage.",
+}
+
+registry = Registry()
+
+
+class _Record:
+    """Handed out by an enabled ``stage``; times the block and collects its counters."""
+
+    __slots__ = ("name", "pixels", "start")
+
+    def __init__(self, name, pixels):
+        self.name = name
+        self.pixels = pixels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registry.observe("gear_stage_seconds", self.name, time.perf_counter() - self.start, SECONDS_BUCKETS)
+        if self.pixels:
+            registry.add("gear_stage_pixels_total", self.name, self.pixels)
+        return False
+
+    def contours(self, count):
+        registry.observe("gear_stage_contours", self.name, count, CONTOUR_BUCKETS)
+
+
+class _NoopRecord:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def contours(self, count):
+        pass
+
+
+_NOOP = _NoopRecord()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def stage(name, pixels=0):
+    """Context manager timing one stage; ``pixels`` is added to the stage's pixel counter."""
+    if not _enabled:
+        return _NOOP
+    return _Record(name, pixels)
+
+
+def timed(name):
+    """Decorator timing every call of the function as the stage ``name``."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Record(name, 0):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render():
+    return registry.render()
+
+
+def dump(path):
+    """Write the current metrics to ``path`` atomically, so a scraper never reads half a file."""
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        file.write(render())
+    os.replace(temporary, path)
+
+
+class PeriodicDump:
+    """Background thread writing ``render()`` to ``path`` every ``interval`` seconds, and once more on stop."""
+
+    def __init__(self, path, interval=10.0):
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            dump(self.path)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        dump(self.path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
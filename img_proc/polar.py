@@ -0,0 +1,161 @@
+import cv2
+import numpy as np
+
+from gear_reference import HUB_RADIUS, THRESHOLD
+from img import describe, inspect_diameter, inspection_parameters, worn_ratio
+from instrumentation import stage
+
+# Fraction of a tooth that must be missing before it is reported at all
+MIN_LOSS = 0.15
+# Same ratio as the contour mode: a faulty area below 85% of the ideal tooth means worn out, otherwise broken
+WORN_RATIO = worn_ratio
+
+
+class PolarRing:
+    """The tooth annulus of the ideal gear unwrapped into a strip of one row per angle.
+
+    Only the pixels between ``inner_radius`` and ``outer_radius`` around the reference centre are
+    resampled, so a sample costs ``angles * (outer_radius - inner_radius)`` pixels instead of the full frame.
+    Each row is reduced to the count of gear pixels along that ray, which turns the teeth into a 1-D
+    angular profile. Teeth are segmented once from the ideal profile into angular sectors.
+    """
+
+    def __init__(self, reference, angles=720, inner_radius=HUB_RADIUS, outer_radius=None, margin=4):
+        self.centre = reference.centre
+        self.angles = angles
+        self.inner_radius = inner_radius
+        if outer_radius is None:
+            outer_radius = self._tip_radius(reference) + margin
+        self.outer_radius = outer_radius
+
+        # Equivalent to cv2.warpPolar cropped to the annulus, but the maps never cover the hub
+        theta = np.arange(angles, dtype=np.float32) * np.float32(2 * np.pi / angles)
+        radius = np.arange(inner_radius, outer_radius, dtype=np.float32)
+        map_x = self.centre[0] + np.cos(theta)[:, None] * radius[None, :]
+        map_y = self.centre[1] + np.sin(theta)[:, None] * radius[None, :]
+        self.map1, self.map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+        self.ideal_strip = self.strip(reference.ideal_threshold)
+        self.ideal_profile = self.profile(self.ideal_strip)
+        self._segment_teeth()
+
+    @staticmethod
+    def _tip_radius(reference):
+        if len(reference.teeth_contours) == 0:
+            return HUB_RADIUS + 1
+        points = np.concatenate(reference.teeth_contours).reshape(-1, 2) - reference.centre
+        return int(np.ceil(np.sqrt((points.astype(np.float64) ** 2).sum(axis=1)).max()))
+
+    @property
+    def pixels(self):
+        return self.angles * (self.outer_radius - self.inner_radius)
+
+    def unwrap(self, image):
+        """Resample the tooth annulus of ``image`` into an (angles, radii) strip."""
+        return cv2.remap(image, self.map1, self.map2, cv2.INTER_LINEAR,
+                         borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+    def strip(self, image):
+        """Binary mask of the unwrapped annulus."""
+        ret, strip = cv2.threshold(self.unwrap(image), THRESHOLD, 255, cv2.THRESH_BINARY)
+        return strip
+
+    @staticmethod
+    def profile(strip):
+        """Number of gear pixels along the ray at every angle."""
+        return np.count_nonzero(strip, axis=1).astype(np.float64)
+
+    def _segment_teeth(self):
+        profile = self.ideal_profile
+        self.root = profile.min()
+        tip = profile.max()
+        if tip - self.root < 1:
+            self.tooth_of_angle = np.zeros(self.angles, dtype=np.intp)
+            self.baseline = profile.copy()
+            self.tooth_angles = np.empty(0)
+            self.tooth_areas = np.empty(0)
+            return
+
+        # Start the scan at the deepest gap so no tooth wraps around the strip end
+        start = int(profile.argmin())
+        is_tooth = np.roll(profile > (self.root + tip) / 2, -start).astype(np.int8)
+        edges = np.diff(np.concatenate(([0], is_tooth, [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        centres = (starts + ends - 1) / 2
+
+        # Every angle belongs to the tooth whose centre is nearest, split halfway between neighbours
+        boundaries = (centres[1:] + centres[:-1]) / 2
+        tooth_of_rolled = np.searchsorted(boundaries, np.arange(self.angles), side="right")
+        self.tooth_of_angle = np.roll(tooth_of_rolled, start)
+        self.tooth_angles = ((centres + start) % self.angles) * 360.0 / self.angles
+
+        # The root of each tooth is the lowest point of its own sector, which absorbs a slightly
+        # off-centre reference instead of counting the body's eccentricity as tooth area
+        sector_starts = np.searchsorted(tooth_of_rolled, np.arange(len(centres)))
+        roots = np.minimum.reduceat(np.roll(profile, -start), sector_starts)
+        self.baseline = roots[self.tooth_of_angle]
+        self.tooth_areas = np.bincount(self.tooth_of_angle, weights=profile - self.baseline,
+                                       minlength=len(centres))
+
+    def tooth_loss(self, sample_strip):
+        """Fraction of every ideal tooth missing from the sample strip, in tooth order."""
+        sample_profile = self.profile(sample_strip)
+        # Extra material must not hide missing material on the same tooth
+        present = np.clip(np.minimum(sample_profile, self.ideal_profile) - self.baseline, 0, None)
+        present_areas = np.bincount(self.tooth_of_angle, weights=present, minlength=len(self.tooth_areas))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            loss = np.where(self.tooth_areas > 0, 1 - present_areas / self.tooth_areas, 0.0)
+        return loss
+
+
+def inspect_sample_polar(reference, ring, sample, min_loss=MIN_LOSS, worn_ratio=WORN_RATIO, prescreen_pixels=None):
+    """Polar counterpart of ``img.inspect_sample``, including its ``prescreen_pixels`` fast-reject.
+
+    Returns the same result keys plus ``teeth``, the angular position (degrees, clockwise from the
+    +x axis of the image) and lost fraction of every faulty tooth. The mask returned is the polar
+    strip of ideal gear pixels that are missing from the sample.
+    """
+    with stage("unwrap", pixels=ring.pixels):
+        sample_strip = ring.strip(sample)
+    with stage("prescreen", pixels=ring.pixels):
+        missing = cv2.bitwise_and(ring.ideal_strip, cv2.bitwise_not(sample_strip))
+        changed_pixels = cv2.countNonZero(missing)
+    if prescreen_pixels is not None and changed_pixels <= prescreen_pixels:
+        decided_by = "prescreen"
+        loss = np.zeros(len(ring.tooth_areas))
+    else:
+        decided_by = "full"
+        with stage("tooth_loss", pixels=ring.pixels):
+            loss = ring.tooth_loss(sample_strip)
+    faulty = np.flatnonzero(loss > min_loss)
+    worn = loss[faulty] < worn_ratio
+
+    teeth = [
+        {"angle": round(float(ring.tooth_angles[i]), 2), "loss": round(float(loss[i]), 3),
+         "type": "worn" if is_worn else "broken"}
+        for i, is_worn in zip(faulty, worn)
+    ]
+
+    inner_diameter, status = inspect_diameter(reference, sample)
+    worn_out_teeth = int(np.count_nonzero(worn))
+    result = {
+        "defects": len(faulty),
+        "broken_teeth": len(faulty) - worn_out_teeth,
+        "worn_out_teeth": worn_out_teeth,
+        "inner_diameter": inner_diameter,
+        "diameter_status": status,
+        "stage": decided_by,
+        "changed_pixels": changed_pixels,
+        "teeth": teeth,
+    }
+    result["description"] = describe(result)
+    return result, missing
+
+
+def polar_parameters(ring, min_loss=MIN_LOSS, worn_ratio=WORN_RATIO, prescreen_pixels=None):
+    """Every setting the polar inspection result depends on, part of the result cache key."""
+    parameters = inspection_parameters(prescreen_pixels)
+    parameters.update(mode="polar", angles=ring.angles, inner_radius=ring.inner_radius,
+                      outer_radius=ring.outer_radius, min_loss=min_loss, worn_ratio=worn_ratio)
+    return parameters
@@ -0,0 +1,127 @@
+"""On-disk cache of inspection results keyed by image content, reference model and parameters.
+
+A result is stored under the SHA-256 of (image bytes digest, ``GearReference.fingerprint()``,
+parameter set), so changing the image, the ideal gear or any threshold misses the cache on its own.
+Content digests are remembered per (path, size, mtime), which lets a re-run of an unchanged
+archive skip reading the files as well. The cache is one SQLite file, shared safely by worker
+processes, and ``evict`` trims it to ``max_bytes`` of stored results, least recently used first.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# Bump when the result format or the analysis changes in a way the parameters do not capture
+CACHE_VERSION = 2
+
+# A hit only rewrites a result's last use when that is older than this many seconds, so re-reading
+# recently used results takes no write lock; eviction order is exact to within this granularity
+USED_GRANULARITY = 3600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+"""
+
+
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(image_digest, reference_digest, parameters):
+    """Key of one inspection, ``parameters`` is a JSON-serialisable dict of everything that affects the result."""
+    encoded = json.dumps({"version": CACHE_VERSION, "parameters": parameters}, sort_keys=True)
+    return hashlib.sha256(f"{image_digest}:{reference_digest}:{encoded}".encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path, max_bytes=64 * 2 ** 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(_SCHEMA)
+
+    def file_digest(self, path):
+        """Return (digest, data) of an image file.
+
+        When the file's size and modification time match the last time it was hashed, the stored
+        digest is returned with ``data`` None and the file is not read at all.
+        """
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        row = self.connection.execute("SELECT size, mtime_ns, digest FROM files WHERE path = ?", (key,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2], None
+        with open(path, "rb") as file:
+            data = file.read()
+        digest = content_digest(data)
+        self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                                (key, stat.st_size, stat.st_mtime_ns, digest))
+        return digest, data
+
+    def get(self, key):
+        row = self.connection.execute("SELECT result, used FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        now = time.time()
+        if now - row[1] > USED_GRANULARITY:
+            self.connection.execute("UPDATE results SET used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        encoded = json.dumps(result)
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                (key, encoded, len(encoded), time.time()))
+
+    def size(self):
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def evict(self):
+        """Drop the least recently used results until the stored results fit in ``max_bytes``; returns the count.
+
+        The digests of files that no longer exist are dropped as well, whether or not results are evicted.
+        """
+        excess = self.size() - self.max_bytes
+        evicted, freed = [], 0
+        if excess > 0:
+            for key, size in self.connection.execute("SELECT key, size FROM results ORDER BY used").fetchall():
+                if freed >= excess:
+                    break
+                evicted.append((key,))
+                freed += size
+        self.connection.execute("BEGIN IMMEDIATE")
+        self.connection.executemany("DELETE FROM results WHERE key = ?", evicted)
+        # Forget files that are gone, their digests can never be looked up again
+        stale = [(path,) for (path,) in self.connection.execute("SELECT path FROM files").fetchall()
+                 if not os.path.exists(path)]
+        self.connection.executemany("DELETE FROM files WHERE path = ?", stale)
+        self.connection.execute("COMMIT")
+        return len(evicted)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
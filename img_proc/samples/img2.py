@@ -8,8 +8,26 @@ def findCentre(contour):
     cx = int(M['m10'] / M['m00'])
     cy = int(M['m01'] / M['m00'])
     return (cx, cy)
+
+# Function defined to label every blob of a binary mask in one pass then return their centres and the labelling
+def componentStats(mask):
+    n, labels, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity = 8)
+    # label 0 is the background
+    return centroids[1:].astype(np.int32), (labels, stats[1:])
+
+# Function defined to find the contour area of the given blobs, each traced on its own bounding box only
+def blobAreas(labelling, blobs):
+    labels, stats = labelling
+    areas = []
+    for blob in blobs:
+        x, y, w, h = stats[blob, :4]
+        blob_mask = cv2.copyMakeBorder((labels[y:y+h, x:x+w] == blob + 1).astype(np.uint8), 1, 1, 1, 1, cv2.BORDER_CONSTANT, value = 0)
+        contours, _ = cv2.findContours(blob_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        areas.append(sum(cv2.contourArea(c) for c in contours))
+    return np.array(areas, dtype = np.float64)
 ###################### PART I: TEETH INSPECTION ###########################################
 ############ READ THE IDEAL AND SAMPLE IMAGES (GRAYSCALE) AND CREATE MASK #################
+# Each image is decoded once, both parts read these arrays and draw on copies only
 sample_image = "sample6.jpg"
 ideal_image = cv2.imread("sample1.jpg")
 ideal = cv2.cvtColor(ideal_image, cv2.COLOR_BGR2GRAY)
@@ -21,7 +39,7 @@ ret, sample_threshold = cv2.threshold(sample, 30, 255, cv2.THRESH_BINARY)
 
 
 ############ GET THE BINARY IMAGE OF THE IDEAL TEETH #################
-ideal_teeth = cv2.cvtColor(ideal_image, cv2.COLOR_BGR2GRAY)
+ideal_teeth = ideal.copy()
 
 # Draw 2 black circles to remove everything except the teeth
 cx, cy = findCentre(ideal_threshold)
@@ -46,82 +64,59 @@ cv2.circle(difference,(cx + 6,cy),165,(0, 0, 0),-1)
 
 # Erode to remove noise and the connection of the teeth. Done to find contours for each individual tooth
 difference_erosion = cv2.erode(difference, np.ones((3,3), np.uint8), iterations = 1)
-contours_difference, _ = cv2.findContours(difference_erosion,cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+difference_centres, difference_labelling = componentStats(difference_erosion)
 
 
 ############ DRAW A BOUNDING CIRCLE FOR EACH FAULTY TOOTH #################
-contours_difference_centres = []
-for c in contours_difference:
-    cx,cy =findCentre(c)
-    cv2.circle(difference_erosion, (cx,cy),22,(255,255,255),-1)
-    # Save the centres of each faulty tooth in a list to be matched with the ideal teeth
-    contours_difference_centres.append((cx, cy))
+for cx, cy in difference_centres:
+    cv2.circle(difference_erosion, (int(cx), int(cy)),22,(255,255,255),-1)
 
 
 ########### USE BOUNDING CIRCLE TO MATCH IDEAL TEETH WITH BROKEN TEETH ####################
 ideal_teeth_filtered = cv2.bitwise_and(difference_erosion, ideal_teeth_erosion)
-contours_ideal_teeth_filtered , _ = cv2.findContours(ideal_teeth_filtered ,cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-
 
-########### FIND THE CENTRES OF THE FILTERED IDEAL TEETH FOR COMPARISON ##################
-contours_ideal_teeth_filtered_centres = []
-for c in contours_ideal_teeth_filtered:
-    cx,cy =findCentre(c)
-    contours_ideal_teeth_filtered_centres.append((cx,cy))
+# Centres of the filtered ideal teeth for comparison
+ideal_teeth_filtered_centres, ideal_teeth_filtered_labelling = componentStats(ideal_teeth_filtered)
 
 
 ############# COMPARE CENTRES TO MATCH THE IDEAL TEETH TO FAULTY TEETH ################
-contours_ideal_teeth_matched = []
-count = 0
-
-# Comparing the centre of a faulty teeth to all the available ideal teeth by
-# calculating the centre distance between the faulty tooth and each of the ideal teeth
-for i in contours_difference_centres:
-    diff_x = i[0]
-    diff_y = i[1]
-    for j in contours_ideal_teeth_filtered_centres:
-        ideal_x = j[0]
-        ideal_y = j[1]
-        centre_distance = ((ideal_x-diff_x)**2 + (ideal_y - diff_y)**2) ** 0.5
-        if centre_distance < 20:
-            contours_ideal_teeth_matched.append(contours_ideal_teeth_filtered[count])
-            break # speeds up the process, since only a single centre distance satisfies condition
-        count += 1
-    count = 0 # count variable is used as the index for the contours list
+# Calculate the centre distance between every faulty tooth and every ideal tooth at once,
+# then keep the nearest ideal tooth of each faulty tooth if it is closer than 20
+matched = np.empty(0, dtype = np.intp)
+if len(difference_centres) > 0 and len(ideal_teeth_filtered_centres) > 0:
+    delta = difference_centres[:, None, :] - ideal_teeth_filtered_centres[None, :, :]
+    distance_squared = (delta ** 2).sum(axis = 2)
+    nearest = distance_squared.argmin(axis = 1)
+    matched = nearest[distance_squared[np.arange(len(nearest)), nearest] < 20 ** 2]
 
 
 ################ WORN OUT (blue) OR BROKEN (red) #####################
-# Define the variables to count the faulty teeth into two categories
-worn_out_teeth = 0
-broken_teeth = 0
-teeth_image = ideal_image
+teeth_image = ideal_image.copy()
 
 # Compare the area of the faulty tooth to the matching ideal tooth
 # if the area of each is almost the same, the tooth is likely to be broken
 # if the area of each is significantly different, the tooth is likey to be worn out
-for i in range (0,len(contours_difference)):
-    area_difference = cv2.contourArea(contours_difference[i])
-    area_ideal = cv2.contourArea(contours_ideal_teeth_matched[i])
-    if(area_difference / area_ideal < 0.85):
-        worn_out_teeth  += 1
-        cx,cy = findCentre(contours_difference[i])
-        cv2.circle(teeth_image, (cx,cy),10,(255,0,0),3)
+# Only the paired blobs are traced for their contour areas
+difference_areas = blobAreas(difference_labelling, range(len(matched)))
+ideal_teeth_filtered_areas = np.maximum(blobAreas(ideal_teeth_filtered_labelling, matched), 0.5)
+worn = difference_areas / ideal_teeth_filtered_areas < 0.85
+worn_out_teeth = int(np.count_nonzero(worn))
+broken_teeth = len(matched) - worn_out_teeth
+
+for (cx, cy), is_worn in zip(difference_centres, worn):
+    if is_worn:
+        cv2.circle(teeth_image, (int(cx), int(cy)),10,(255,0,0),3)
     else:
-        broken_teeth +=1
-        cx, cy = findCentre(contours_difference[i])
-        cv2.circle(teeth_image, (cx, cy), 15, (0, 0, 255), 5)
+        cv2.circle(teeth_image, (int(cx), int(cy)), 15, (0, 0, 255), 5)
 
 
 ########################## PART II: INNER DIAMETER ###########################################
-# Reread the images to remove previous edits
-ideal_image = cv2.imread("sample1.jpg")
-sample_image = cv2.imread(sample_image, cv2.IMREAD_GRAYSCALE)
-ideal_diameter = cv2.cvtColor(ideal_image, cv2.COLOR_BGR2GRAY)
+# PART I drew on a copy, so the decoded images are still unedited
 
 # Recreate the binary masks, this time with inverse thresholding
 # This is done so that the inner circle will be white and so, its contours can be found
-ret, ideal_diameter_threshold = cv2.threshold(ideal_diameter, 30, 255, cv2.THRESH_BINARY_INV)
-ret, sample_threshold = cv2.threshold(sample_image, 30, 255, cv2.THRESH_BINARY_INV)
+ret, ideal_diameter_threshold = cv2.threshold(ideal, 30, 255, cv2.THRESH_BINARY_INV)
+ret, sample_threshold = cv2.threshold(sample, 30, 255, cv2.THRESH_BINARY_INV)
 
 # Draw 1 black circle with high thickness to remove everything except the centre part of gear
 cx, cy = findCentre(ideal_threshold)
@@ -0,0 +1,288 @@
+import argparse
+import collections
+import json
+import queue
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import instrumentation
+from gear_reference import GearReference
+from img import inspect_sample
+from polar import PolarRing, inspect_sample_polar
+
+# End of stream marker passed down the pipeline
+_STOP = object()
+
+# Seconds main waits for the stages to drain after Ctrl+C
+STOP_TIMEOUT = 10.0
+
+
+class FrameQueue:
+    """Bounded queue between two stages.
+
+    With the "block" policy a full queue makes the producer wait (back-pressure reaches the camera).
+    With "drop" the oldest queued frame is discarded so the newest one always gets in.
+    Each queue has a single producer, which keeps drop-oldest race free.
+    """
+
+    def __init__(self, maxsize, policy="block"):
+        if policy not in ("block", "drop"):
+            raise ValueError(f"Unknown back-pressure policy: {policy}")
+        self.queue = queue.Queue(maxsize)
+        self.policy = policy
+        self.dropped = 0
+
+    def put(self, item):
+        if self.policy == "block" or item is _STOP:
+            self.queue.put(item)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self):
+        return self.queue.get()
+
+
+class StageStats:
+    """Per-stage latencies in seconds, keeping the most recent ``window`` frames for percentiles."""
+
+    def __init__(self, window=10000):
+        self.latencies = collections.deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.count += 1
+
+    def summary(self, percentiles=(50, 90, 99)):
+        with self.lock:
+            values = np.array(self.latencies)
+        report = {"frames": self.count}
+        if len(values) > 0:
+            for p, value in zip(percentiles, np.percentile(values, percentiles)):
+                report[f"p{p}_ms"] = round(float(value) * 1000, 3)
+        return report
+
+
+class StreamPipeline:
+    """decode -> inspect -> annotate/record, one thread per stage, connected by bounded queues."""
+
+    STAGES = ("decode", "inspect", "annotate", "end_to_end")
+
+    def __init__(self, source, reference, mode="contour", prescreen_pixels=None, queue_size=8,
+                 policy="block", records=None, video_path=None):
+        self.source = source
+        self.reference = reference
+        self.ring = PolarRing(reference) if mode == "polar" else None
+        self.prescreen_pixels = prescreen_pixels
+        self.decoded = FrameQueue(queue_size, policy)
+        self.inspected = FrameQueue(queue_size, policy)
+        self.records = records
+        self.video_path = video_path
+        self.stats = {stage: StageStats() for stage in self.STAGES}
+        self.frames_read = 0
+        self.frames_done = 0
+        self.started = None
+        self.stopping = threading.Event()
+        self.threads = []
+        self.errors = []
+
+    def stop(self):
+        """Ask the decode stage to stop reading; frames already queued still drain."""
+        self.stopping.set()
+
+    def join(self, timeout=None):
+        """Wait up to ``timeout`` seconds in total for the stages to finish; returns True once they all have."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for thread in self.threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.perf_counter()))
+        return not any(thread.is_alive() for thread in self.threads)
+
+    def _decode(self):
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            self.errors.append(f"Could not open video source: {self.source}")
+        try:
+            while capture.isOpened() and not self.stopping.is_set():
+                start = time.perf_counter()
+                with instrumentation.stage("decode"):
+                    ok, frame = capture.read()
+                    if not ok:
+                        break
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+                self.stats["decode"].add(time.perf_counter() - start)
+                self.decoded.put({"index": self.frames_read, "captured": start, "frame": frame, "gray": gray})
+                self.frames_read += 1
+        finally:
+            capture.release()
+            self.decoded.put(_STOP)
+
+    def _inspect(self):
+        try:
+            while True:
+                item = self.decoded.get()
+                if item is _STOP:
+                    return
+                start = time.perf_counter()
+                gray = item.pop("gray")
+                try:
+                    if gray.shape != self.reference.shape:
+                        item["result"] = {"status": "error",
+                                          "error": f"frame shape {gray.shape} does not match reference {self.reference.shape}"}
+                        item["mask"] = None
+                    elif self.ring is not None:
+                        item["result"], item["mask"] = inspect_sample_polar(self.reference, self.ring, gray,
+                                                                            prescreen_pixels=self.prescreen_pixels)
+                    else:
+                        item["result"], item["mask"] = inspect_sample(self.reference, gray,
+                                                                      prescreen_pixels=self.prescreen_pixels)
+                except Exception as error:
+                    # One bad frame becomes an error record instead of ending the stream
+                    item["result"] = {"status": "error", "error": f"inspection failed: {error!r}"}
+                    item["mask"] = None
+                self.stats["inspect"].add(time.perf_counter() - start)
+                self.inspected.put(item)
+        finally:
+            # Also when this thread dies, so the annotate stage and run() still finish
+            self.inspected.put(_STOP)
+
+    def _annotate(self):
+        writer = None
+        try:
+            while True:
+                item = self.inspected.get()
+                if item is _STOP:
+                    return
+                start = time.perf_counter()
+                frame, result, mask = item["frame"], item["result"], item["mask"]
+                try:
+                    if self.video_path is not None:
+                        with instrumentation.stage("annotate", pixels=frame.shape[0] * frame.shape[1]):
+                            self._draw(frame, result, mask)
+                            if writer is None:
+                                height, width = frame.shape[:2]
+                                writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*"mp4v"), 30,
+                                                         (width, height))
+                            writer.write(frame)
+                    if self.records is not None:
+                        record = {"frame": item["index"]}
+                        record.update(result)
+                        self.records.write(json.dumps(record) + "\n")
+                except Exception as error:
+                    # Keep draining, a stopped consumer would block the upstream stages on full queues
+                    self.errors.append(f"frame {item['index']}: annotation failed: {error!r}")
+                end = time.perf_counter()
+                self.stats["annotate"].add(end - start)
+                self.stats["end_to_end"].add(end - item["captured"])
+                self.frames_done += 1
+        finally:
+            if writer is not None:
+                writer.release()
+
+    @staticmethod
+    def _draw(frame, result, mask):
+        # Contour mode masks are full frame, mark the faulty teeth in red
+        if mask is not None and mask.shape == frame.shape[:2]:
+            frame[mask > 0] = (0, 0, 255)
+        text = result.get("description", result.get("error", ""))
+        cv2.putText(frame, text, (10, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+    def run(self, report_every=None, report=None):
+        """Run all stages until the source ends (or ``stop`` is called) and return the final report.
+
+        With ``report_every`` seconds set, ``report`` is called periodically with the running report.
+        """
+        self.started = time.perf_counter()
+        self.threads = [threading.Thread(target=target, name=name, daemon=True)
+                        for name, target in (("decode", self._decode), ("inspect", self._inspect),
+                                             ("annotate", self._annotate))]
+        for thread in self.threads:
+            thread.start()
+        while self.threads[-1].is_alive():
+            self.threads[-1].join(timeout=report_every)
+            if report_every is not None and report is not None and self.threads[-1].is_alive():
+                report(self.report())
+        self.join()
+        return self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "frames_read": self.frames_read,
+            "frames_done": self.frames_done,
+            "dropped": self.decoded.dropped + self.inspected.dropped,
+            "seconds": round(elapsed, 3),
+            "fps": round(self.frames_done / elapsed, 2) if elapsed > 0 else 0.0,
+            "stages": {stage: stats.summary() for stage, stats in self.stats.items()},
+            "errors": list(self.errors),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect gears on a live camera or video stream")
+    parser.add_argument("source", help="video file, stream URL or camera index")
+    parser.add_argument("--reference", default="samples/ideal.jpg",
+                        help="ideal gear image or precomputed .npz reference (default: samples/ideal.jpg)")
+    parser.add_argument("--mode", choices=("contour", "polar"), default="contour")
+    parser.add_argument("--prescreen", type=int, metavar="PIXELS", default=None,
+                        help="pass frames with at most this many differing tooth-ring pixels without tooth matching")
+    parser.add_argument("--queue-size", type=int, default=8, help="frames buffered between two stages (default: 8)")
+    parser.add_argument("--policy", choices=("block", "drop"), default="block",
+                        help="block: slow the reader down when a queue is full, drop: discard the oldest frame")
+    parser.add_argument("--records", default=None, help="JSONL file for one record per frame, '-' for stdout")
+    parser.add_argument("--video", default=None, help="write the annotated frames to this video file")
+    parser.add_argument("--metrics", metavar="FILE", default=None,
+                        help="record per-stage timings and dump them in Prometheus text format to FILE")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, metavar="SECONDS",
+                        help="how often the metrics file is rewritten (default: 10)")
+    parser.add_argument("--report-every", type=float, default=None, metavar="SECONDS",
+                        help="print the running throughput report to stderr periodically")
+    args = parser.parse_args(argv)
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    reference = GearReference.load_or_build(args.reference)
+    records = None
+    if args.records == "-":
+        records = sys.stdout
+    elif args.records is not None:
+        records = open(args.records, "w")
+
+    dumper = None
+    if args.metrics is not None:
+        instrumentation.enable()
+        dumper = instrumentation.PeriodicDump(args.metrics, args.metrics_interval).start()
+
+    pipeline = StreamPipeline(source, reference, args.mode, args.prescreen, args.queue_size, args.policy,
+                              records, args.video)
+    try:
+        final = pipeline.run(args.report_every, lambda running: print(json.dumps(running), file=sys.stderr))
+    except KeyboardInterrupt:
+        # Let the queued frames drain, the annotate stage may still be writing records and video
+        pipeline.stop()
+        if not pipeline.join(STOP_TIMEOUT):
+            print(f"Stages still running after {STOP_TIMEOUT:g}s, closing the outputs anyway", file=sys.stderr)
+        final = pipeline.report()
+    finally:
+        if records is not None and records is not sys.stdout:
+            records.close()
+        if dumper is not None:
+            dumper.stop()
+    print(json.dumps(final, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
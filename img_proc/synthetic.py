@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+from img import diameter_status
+
+# Sub-pixel precision used for fillPoly/circle, the shapes are drawn with 4 fractional bits
+_SHIFT = 4
+_SCALE = 1 << _SHIFT
+
+
+def render_gear(teeth=30, tip_radius=198, root_radius=168, inner_radius=25, broken=(), worn=None,
+                size=600, phase=0.0, gear_level=235, background_level=5, noise=0.0, blur=0,
+                jpeg_quality=None, rng=None):
+    """Render a white gear on a black background like the line camera sees it.
+
+    ``broken`` holds the indices of teeth that are missing down to the root circle. ``worn`` maps a
+    tooth index to the fraction (0..1) of the tooth height worn off its tip. Tooth ``k`` is centred at
+    ``phase + 360 * k / teeth`` degrees, clockwise from the +x axis of the image.
+    Returns a uint8 grayscale image.
+    """
+    worn = worn or {}
+    broken = set(broken)
+    image = np.full((size, size), background_level, np.uint8)
+    centre = np.array([size / 2, size / 2])
+
+    def fixed(points):
+        return np.round(np.asarray(points) * _SCALE).astype(np.int32)
+
+    cv2.circle(image, tuple(fixed(centre)), int(round(root_radius * _SCALE)), gear_level, -1, cv2.LINE_AA, _SHIFT)
+
+    pitch = 2 * np.pi / teeth
+    # Teeth start inside the body so the flanks join the root circle without a seam
+    base_radius = root_radius - 6
+    for k in range(teeth):
+        if k in broken:
+            continue
+        tip = tip_radius - worn.get(k, 0.0) * (tip_radius - root_radius)
+        angle = np.deg2rad(phase) + k * pitch
+        base_half, tip_half = 0.3 * pitch, 0.15 * pitch * tip_radius / max(tip, 1)
+        polygon = [centre + r * np.array([np.cos(angle + a), np.sin(angle + a)])
+                   for r, a in ((base_radius, -base_half), (tip, -tip_half), (tip, tip_half), (base_radius, base_half))]
+        cv2.fillPoly(image, [fixed(polygon)], gear_level, cv2.LINE_AA, _SHIFT)
+
+    cv2.circle(image, tuple(fixed(centre)), int(round(inner_radius * _SCALE)), background_level, -1, cv2.LINE_AA, _SHIFT)
+
+    if blur:
+        image = cv2.GaussianBlur(image, (0, 0), blur)
+    if noise:
+        rng = rng or np.random.default_rng()
+        image = np.clip(image + rng.normal(0, noise, image.shape), 0, 255).astype(np.uint8)
+    if jpeg_quality is not None:
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        image = cv2.imdecode(encoded, cv2.IMREAD_GRAYSCALE)
+    return image
+
+
+def ground_truth(teeth, broken, worn, inner_radius, phase=0.0):
+    """Expected inspection result of a gear rendered with the same arguments."""
+    return {
+        "teeth": teeth,
+        "broken": sorted(int(k) for k in broken),
+        "worn": sorted(int(k) for k in worn),
+        "broken_angles": sorted(round((phase + 360.0 * k / teeth) % 360, 2) for k in broken),
+        "worn_angles": sorted(round((phase + 360.0 * k / teeth) % 360, 2) for k in worn),
+        "inner_radius": inner_radius,
+        "diameter_status": diameter_status(np.pi * inner_radius ** 2),
+    }
+
+
+def random_gear_spec(rng, teeth=30, defect_rate=0.3, max_defects=4, bad_diameter_rate=0.1,
+                     nominal_inner_radius=25, wear_range=(0.3, 0.7)):
+    """Pick random defects for one gear; returns keyword arguments for ``render_gear``."""
+    broken, worn = [], {}
+    if rng.random() < defect_rate:
+        count = int(rng.integers(1, max_defects + 1))
+        for k in rng.choice(teeth, size=min(count, teeth), replace=False):
+            if rng.random() < 0.5:
+                broken.append(int(k))
+            else:
+                worn[int(k)] = float(rng.uniform(*wear_range))
+    inner_radius = nominal_inner_radius
+    if rng.random() < bad_diameter_rate:
+        # Clearly outside the 5% area tolerance in either direction
+        inner_radius = nominal_inner_radius + int(rng.choice([-4, -3, 3, 4]))
+    return {"teeth": teeth, "broken": broken, "worn": worn, "inner_radius": inner_radius}
+
+
+def generate_dataset(count, seed=0, teeth=30, defect_rate=0.3, max_defects=4, bad_diameter_rate=0.1,
+                     noise=2.0, blur=0.0, jpeg_quality=90):
+    """Yield (image, truth) pairs, plus the ideal image first with ``truth`` None."""
+    rng = np.random.default_rng(seed)
+    render = {"noise": noise, "blur": blur, "jpeg_quality": jpeg_quality, "rng": rng}
+    yield render_gear(teeth=teeth, **render), None
+    for _ in range(count):
+        spec = random_gear_spec(rng, teeth, defect_rate, max_defects, bad_diameter_rate)
+        yield render_gear(**spec, **render), ground_truth(**spec)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic gear images with known defects and their ground truth")
+    parser.add_argument("folder", help="output folder, gets ideal.jpg, sample<N>.jpg and truth.jsonl")
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--start", type=int, default=2, help="number of the first sample (default: 2, as img.py expects)")
+    parser.add_argument("--teeth", type=int, default=30)
+    parser.add_argument("--defect-rate", type=float, default=0.5, help="fraction of gears with faulty teeth")
+    parser.add_argument("--max-defects", type=int, default=4)
+    parser.add_argument("--bad-diameter-rate", type=float, default=0.2)
+    parser.add_argument("--noise", type=float, default=2.0, help="gaussian noise sigma in gray levels")
+    parser.add_argument("--jpeg-quality", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.folder, exist_ok=True)
+    dataset = generate_dataset(args.count, args.seed, args.teeth, args.defect_rate, args.max_defects,
+                               args.bad_diameter_rate, args.noise, jpeg_quality=None)
+    with open(os.path.join(args.folder, "truth.jsonl"), "w") as truth_file:
+        for number, (image, truth) in enumerate(dataset, start=args.start - 1):
+            name = "ideal.jpg" if truth is None else f"sample{number}.jpg"
+            cv2.imwrite(os.path.join(args.folder, name), image, [cv2.IMWRITE_JPEG_QUALITY, args.jpeg_quality])
+            if truth is not None:
+                truth_file.write(json.dumps({"name": name, **truth}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""Loading the labelled colour samples of ``data.csv`` (red, green, blue -> label) outside the notebook."""
+import os
+
+import numpy as np
+import pandas as pd
+
+FEATURES = ["red", "green", "blue"]
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data.csv")
+
+
+def load_colors(path=DATA_PATH):
+    """Return (X, y): an (n, 3) uint8 array of RGB values and the n colour names."""
+    data = pd.read_csv(path, dtype={"red": np.uint8, "green": np.uint8, "blue": np.uint8, "label": "category"})
+    return data[FEATURES].to_numpy(), data["label"].to_numpy(dtype=object)
+
+
+def iter_color_chunks(path=DATA_PATH, chunksize=100000):
+    """Yield (X, y) chunks of ``path`` like ``load_colors``, so files larger than memory can be streamed."""
+    reader = pd.read_csv(path, chunksize=chunksize,
+                         dtype={"red": np.uint8, "green": np.uint8, "blue": np.uint8, "label": "category"})
+    for chunk in reader:
+        yield chunk[FEATURES].to_numpy(), chunk["label"].to_numpy(dtype=object)
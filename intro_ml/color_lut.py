@@ -0,0 +1,157 @@
+"""Per-pixel colour labelling of whole images through a precomputed RGB lookup table.
+
+A trained classifier is asked once for the label of every cell of a quantized RGB cube, ``bits``
+per channel (64**3 cells at 6 bits, all 256**3 colours at 8). The labels are stored as a uint8
+cube, so classifying a frame is a right shift of the pixels and one NumPy fancy index, however slow
+the original model's ``predict`` is. ``quantization_report`` measures the accuracy given up by the
+quantization and ``throughput_report`` the speed against the model's own ``predict``.
+
+Run from this folder: python color_lut.py --help
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import MinMaxScaler
+
+from color_data import load_colors
+
+# Cells asked from the model per predict call while compiling
+COMPILE_BATCH = 2 ** 18
+
+
+def as_uint8(values):
+    # Casting would silently wrap or truncate other inputs, e.g. float images in [0, 1] to all zeros
+    values = np.asarray(values)
+    if values.dtype != np.uint8:
+        raise ValueError(f"Expected uint8 RGB values (0-255), got {values.dtype}")
+    return values
+
+
+def table_path(path):
+    # np.save adds .npy to paths without it, load has to look for the same file and labels
+    path = str(path)
+    return path if path.endswith(".npy") else path + ".npy"
+
+
+class ColorLUT:
+    def __init__(self, table, labels, channel_order="rgb"):
+        self.table = table
+        self.labels = np.asarray(labels, dtype=object)
+        self.bits = int(np.log2(table.shape[0]))
+        self.shift = 8 - self.bits
+        # Position of red, green and blue in the last axis of the images classified
+        self.channels = [channel_order.lower().index(channel) for channel in "rgb"]
+
+    @classmethod
+    def compile(cls, model, bits=6, channel_order="rgb"):
+        """Tabulate ``model`` (anything with ``predict`` on (n, 3) RGB rows and ``classes_``) at every cell centre.
+
+        The model gets the raw 0-255 values, so put its scaler in front of it, e.g. with make_pipeline.
+        """
+        if not 1 <= bits <= 8:
+            raise ValueError("bits must be between 1 and 8")
+        shift = 8 - bits
+        # Centre of every cell along one channel, e.g. 2, 6, 10, ... at 6 bits
+        centres = (np.arange(2 ** bits, dtype=np.uint16) << shift) + ((1 << shift) >> 1)
+        labels = np.asarray(model.classes_)
+        if len(labels) > 256:
+            raise ValueError("A uint8 table holds at most 256 labels")
+        cells = 2 ** (3 * bits)
+        table = np.empty(cells, dtype=np.uint8)
+        for start in range(0, cells, COMPILE_BATCH):
+            index = np.arange(start, min(start + COMPILE_BATCH, cells))
+            rgb = np.stack([centres[index >> (2 * bits)], centres[(index >> bits) & (2 ** bits - 1)],
+                            centres[index & (2 ** bits - 1)]], axis=1)
+            table[start:start + len(index)] = np.searchsorted(labels, model.predict(rgb))
+        return cls(table.reshape((2 ** bits,) * 3), labels, channel_order)
+
+    def classify(self, image):
+        """Label index of every pixel of an (..., 3) uint8 image; ``labels[result]`` gives the names."""
+        image = as_uint8(image)
+        if self.shift:
+            image = image >> self.shift
+        red, green, blue = (image[..., channel] for channel in self.channels)
+        return self.table[red, green, blue]
+
+    def predict(self, X):
+        # Same interface as the sklearn model, for (n, 3) RGB rows whatever the channel order of images
+        cells = as_uint8(X) >> self.shift
+        return self.labels[self.table[cells[:, 0], cells[:, 1], cells[:, 2]]]
+
+    def save(self, path):
+        """Write the table to ``path`` (.npy added if missing) and its labels, one per line, next to it in ``.labels.txt``."""
+        path = table_path(path)
+        np.save(path, self.table)
+        with open(path + ".labels.txt", "w") as labels_file:
+            labels_file.write("\n".join(self.labels) + "\n")
+
+    @classmethod
+    def load(cls, path, channel_order="rgb"):
+        # Memory-mapped, so opening even the 16 MB 8-bit table costs nothing until frames are classified
+        path = table_path(path)
+        with open(path + ".labels.txt") as labels_file:
+            labels = labels_file.read().splitlines()
+        return cls(np.load(path, mmap_mode="r"), labels, channel_order)
+
+
+def quantization_report(model, lut, X, y):
+    """Accuracy of the model and of its table on (X, y), and how often the two agree."""
+    model_pred = model.predict(X)
+    lut_pred = lut.predict(X)
+    return {
+        "bits": lut.bits,
+        "model_accuracy": round(float(np.mean(model_pred == y)), 4),
+        "lut_accuracy": round(float(np.mean(lut_pred == y)), 4),
+        "agreement": round(float(np.mean(model_pred == lut_pred)), 4),
+    }
+
+
+def throughput_report(model, lut, image, model_pixels=100000):
+    """Pixels per second of ``lut.classify`` on ``image`` and of ``model.predict`` on a sample of its pixels."""
+    start = time.perf_counter()
+    lut.classify(image)
+    lut_seconds = time.perf_counter() - start
+    pixels = np.asarray(image).reshape(-1, 3)[:model_pixels]
+    start = time.perf_counter()
+    model.predict(pixels)
+    model_seconds = time.perf_counter() - start
+    lut_rate = image.size // 3 / lut_seconds
+    model_rate = len(pixels) / model_seconds
+    return {"lut_pixels_per_second": round(lut_rate), "model_pixels_per_second": round(model_rate),
+            "speedup": round(lut_rate / model_rate, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the notebook's KNN colour classifier into an RGB lookup table")
+    parser.add_argument("--bits", type=int, nargs="+", default=[5, 6, 7], help="bits per channel to compile and compare")
+    parser.add_argument("--neighbors", type=int, default=5)
+    parser.add_argument("--output", default=None, help="save the table of the last --bits value here (.npy)")
+    parser.add_argument("--frame", type=int, nargs=2, default=[1080, 1920], metavar=("HEIGHT", "WIDTH"),
+                        help="size of the random frame used for the speed comparison")
+    args = parser.parse_args(argv)
+
+    X, y = load_colors()
+    # Same split as the notebook: 70% train, 15% validation, 15% test
+    X_train, X_temp, y_train, y_temp = train_test_split(X, y, test_size=0.3, random_state=42)
+    X_val, X_test, y_val, y_test = train_test_split(X_temp, y_temp, test_size=0.5, random_state=42)
+    model = make_pipeline(MinMaxScaler(), KNeighborsClassifier(n_neighbors=args.neighbors))
+    model.fit(np.concatenate((X_train, X_val)), np.concatenate((y_train, y_val)))
+
+    frame = np.random.default_rng(0).integers(0, 256, size=(*args.frame, 3), dtype=np.uint8)
+    for bits in args.bits:
+        start = time.perf_counter()
+        lut = ColorLUT.compile(model, bits)
+        report = {"compile_seconds": round(time.perf_counter() - start, 2)}
+        report.update(quantization_report(model, lut, X_test, y_test))
+        report.update(throughput_report(model, lut, frame))
+        print(report)
+    if args.output:
+        lut.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
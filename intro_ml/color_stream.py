@@ -0,0 +1,133 @@
+"""Out-of-core training of the colour classifiers, and models saved for memory-mapped loading.
+
+``data.csv`` is read in chunks with uint8 RGB columns and categorical labels, never as a whole:
+
+1. a first pass collects the label set and fits a MinMaxScaler with ``partial_fit``;
+2. every further pass (one per epoch) feeds the scaled chunks to a learner's ``partial_fit``.
+
+Every ``holdout``-th row is kept out of training for the accuracy reported at the end, so no split
+of the file is needed either. The scaler and the learner are saved as one sklearn Pipeline with
+uncompressed joblib, whose arrays ``load_model`` memory-maps instead of reading, so a process
+classifying colours starts without retraining and shares the model pages with its neighbours.
+
+Run from this folder: python color_stream.py --help
+"""
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+from sklearn.kernel_approximation import RBFSampler
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import GaussianNB
+from sklearn.neural_network import MLPClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import MinMaxScaler
+
+from color_data import DATA_PATH, iter_color_chunks
+
+MODEL_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+
+def make_learner(name, seed=42):
+    """A model with ``partial_fit``. The colour classes are not linearly separable in RGB, so the
+    linear SGD model gets random Fourier features, which need no pass over the data to fit."""
+    if name == "mlp":
+        return MLPClassifier(hidden_layer_sizes=(64, 64), learning_rate_init=0.003, random_state=seed)
+    if name == "sgd":
+        return make_pipeline(RBFSampler(gamma=10.0, n_components=300, random_state=seed).fit(np.zeros((1, 3))),
+                             SGDClassifier(loss="log_loss", alpha=1e-5, random_state=seed))
+    if name == "nb":
+        return GaussianNB()
+    raise ValueError(f"Unknown learner: {name}")
+
+
+def partial_fit(learner, X, y, classes):
+    # A Pipeline has no partial_fit of its own; its steps before the last are already fitted
+    if hasattr(learner, "steps"):
+        for _, step in learner.steps[:-1]:
+            X = step.transform(X)
+        learner = learner.steps[-1][1]
+    learner.partial_fit(X, y, classes=classes)
+
+
+def training_rows(start, count, holdout):
+    # Rows whose position in the file is not a multiple of ``holdout``
+    return (np.arange(start, start + count) % holdout) != 0 if holdout else np.ones(count, dtype=bool)
+
+
+def train_streaming(learner, path=DATA_PATH, chunksize=100000, epochs=5, holdout=10, seed=42):
+    """Fit a scaler and ``learner`` on ``path`` chunk by chunk; return (pipeline, holdout accuracy, stats)."""
+    start = time.perf_counter()
+    scaler = MinMaxScaler()
+    labels = set()
+    rows = 0
+    for X, y in iter_color_chunks(path, chunksize):
+        keep = training_rows(rows, len(y), holdout)
+        scaler.partial_fit(X[keep])
+        labels.update(y[keep])
+        rows += len(y)
+    classes = np.array(sorted(labels), dtype=object)
+
+    rng = np.random.default_rng(seed)
+    peak_chunk = 0
+    for epoch in range(epochs):
+        position = 0
+        for X, y in iter_color_chunks(path, chunksize):
+            keep = training_rows(position, len(y), holdout)
+            position += len(y)
+            peak_chunk = max(peak_chunk, X.nbytes + y.nbytes)
+            # Shuffle within the chunk, SGD learners do badly on sorted data
+            order = rng.permutation(np.flatnonzero(keep))
+            partial_fit(learner, scaler.transform(X[order]), y[order], classes)
+
+    correct = held_out = 0
+    position = 0
+    model = make_pipeline(scaler, learner)
+    for X, y in iter_color_chunks(path, chunksize):
+        test = ~training_rows(position, len(y), holdout)
+        position += len(y)
+        if test.any():
+            correct += int(np.sum(model.predict(X[test]) == y[test]))
+            held_out += int(test.sum())
+    accuracy = correct / held_out if held_out else float("nan")
+    stats = {"rows": rows, "epochs": epochs, "chunk_rows": chunksize, "largest_chunk_bytes": peak_chunk,
+             "seconds": round(time.perf_counter() - start, 2)}
+    return model, accuracy, stats
+
+
+def save_model(model, path):
+    # Uncompressed, so load_model can memory-map the arrays
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    joblib.dump(model, path, compress=0)
+
+
+def load_model(path, mmap=True):
+    """Load a saved pipeline, its NumPy arrays memory-mapped read-only unless ``mmap`` is False."""
+    return joblib.load(path, mmap_mode="r" if mmap else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train a colour classifier by streaming the CSV in chunks")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--model", default="mlp", choices=["mlp", "sgd", "nb"])
+    parser.add_argument("--chunksize", type=int, default=100000, help="CSV rows per chunk")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--holdout", type=int, default=10, help="keep every n-th row out of training for the accuracy (0: none)")
+    parser.add_argument("--output", default=None, help="where to save the model (default: models/<model>.joblib)")
+    args = parser.parse_args(argv)
+
+    model, accuracy, stats = train_streaming(make_learner(args.model), args.data, args.chunksize, args.epochs, args.holdout)
+    output = args.output or os.path.join(MODEL_DIRECTORY, f"{args.model}.joblib")
+    save_model(model, output)
+    start = time.perf_counter()
+    load_model(output)
+    load_seconds = time.perf_counter() - start
+    stats.update(model=args.model, holdout_accuracy=round(accuracy, 4), saved=output,
+                 load_ms=round(load_seconds * 1000, 2), model_bytes=os.path.getsize(output))
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Hyperparameter search for the colour classifiers with successive halving and cached folds.
+
+The notebook's GridSearchCV fits every configuration on every full fold. Here each grid is searched
+by successive halving: all configurations are scored on a small part of every training fold, the
+best ``1 / eta`` of them move on to ``eta`` times more samples, and so on until the survivors are
+scored on the whole folds. Nearly all fits are therefore cheap ones on few samples.
+
+The stratified folds are split, shuffled and MinMax-scaled once per dataset (the splits are also
+saved next to the cache) and shared by every model and configuration. Every (model, parameters,
+samples, fold) score is kept in a SQLite file. The budgets do not depend on the grid, so re-running a
+sweep with an extra parameter value only fits the new combinations and any configuration that
+newly survives a round. Fits of one round run in parallel on all cores via joblib.
+
+Run from this folder: python color_tuning.py --help
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.svm import SVC
+
+from color_data import load_colors
+
+# Bump when scoring changes in a way the cache key does not capture
+CACHE_VERSION = 1
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tuning_cache")
+
+# The notebook's models and grids
+MODELS = {
+    "knn": (KNeighborsClassifier, {}, {"n_neighbors": [3, 5, 7, 9, 11, 13, 15, 17, 19, 21]}),
+    "rf": (RandomForestClassifier, {"random_state": 42}, {
+        "n_estimators": [50, 100, 200],
+        "max_depth": [None, 10, 20, 30],
+        "min_samples_split": [2, 5, 10],
+        "min_samples_leaf": [1, 2, 4],
+        "bootstrap": [True, False],
+    }),
+    "gb": (GradientBoostingClassifier, {"random_state": 42}, {
+        "n_estimators": [50, 100, 200],
+        "learning_rate": [0.01, 0.1, 0.2],
+        "max_depth": [3, 5, 7],
+        "min_samples_split": [2],
+        "min_samples_leaf": [1],
+        "subsample": [0.9],
+    }),
+    "svm": (SVC, {"random_state": 42}, {
+        "C": [0.1, 1, 10],
+        "kernel": ["linear", "rbf", "poly"],
+        "gamma": ["scale", "auto"],
+        "degree": [3, 4, 5],
+    }),
+}
+
+
+def digest(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Folds:
+    """Stratified K-fold splits of (X, y), each split and scaled once.
+
+    Every training fold is stored in a fixed random order, so the first ``n`` samples of a fold are a
+    random subset of it and a larger budget always contains the smaller ones.
+    """
+
+    def __init__(self, X, y, n_splits=5, seed=42, directory=None):
+        self.key = digest(hashlib.sha256(np.ascontiguousarray(X).tobytes()).hexdigest(), list(y), n_splits, seed)
+        path = os.path.join(directory, f"folds_{self.key[:16]}.npz") if directory else None
+        if path and os.path.exists(path):
+            with np.load(path) as saved:
+                splits = [(saved[f"train{fold}"], saved[f"test{fold}"]) for fold in range(n_splits)]
+        else:
+            rng = np.random.default_rng(seed)
+            splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+            splits = [(rng.permutation(train), test) for train, test in splitter.split(X, y)]
+            if path:
+                os.makedirs(directory, exist_ok=True)
+                np.savez(path, **{f"{name}{fold}": indices for fold, split in enumerate(splits)
+                                  for name, indices in zip(("train", "test"), split)})
+        self.folds = []
+        for train, test in splits:
+            # Scaled on the training fold only, like a pipeline would inside GridSearchCV
+            scaler = MinMaxScaler().fit(X[train])
+            self.folds.append((scaler.transform(X[train]), y[train], scaler.transform(X[test]), y[test]))
+        self.train_size = min(len(fold[1]) for fold in self.folds)
+
+    def __len__(self):
+        return len(self.folds)
+
+
+class ScoreCache:
+    """Validation scores of (model, parameters, samples, fold) in one SQLite file."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, score REAL NOT NULL, seconds REAL NOT NULL)")
+
+    def get_many(self, keys):
+        found = {}
+        # SQLite limits the number of parameters of one statement
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.connection.execute(f"SELECT key, score FROM scores WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            found.update(rows)
+        return found
+
+    def put_many(self, rows):
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?)", rows)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def fit_score(estimator, fixed, params, X_train, y_train, X_test, y_test):
+    start = time.perf_counter()
+    model = estimator(**fixed, **params).fit(X_train, y_train)
+    score = float(np.mean(model.predict(X_test) == y_test))
+    return score, time.perf_counter() - start
+
+
+class SuccessiveHalving:
+    """Successive halving over one model's grid on shared ``Folds`` and a ``ScoreCache``.
+
+    The training budgets per fold are ``min_samples``, ``eta`` times that, and so on, then the whole
+    folds. They depend only on the folds, never on the grid, so sweeps over different grids score
+    their common configurations at the same budgets and share the cached scores. After every round
+    the best ``1 / eta`` of the configurations go on; once one is left it skips to the whole folds.
+    """
+
+    def __init__(self, folds, cache, eta=3, min_samples=100, n_jobs=-1):
+        self.folds = folds
+        self.cache = cache
+        self.eta = eta
+        self.min_samples = min_samples
+        self.n_jobs = n_jobs
+        self.fits = 0
+        self.cached = 0
+
+    def budgets(self):
+        full = self.folds.train_size
+        budgets = []
+        samples = self.min_samples
+        while samples < full:
+            budgets.append(samples)
+            samples *= self.eta
+        return budgets + [full]
+
+    def search(self, name, grid=None):
+        """Return (best parameters, mean CV accuracy, rounds) where rounds lists (samples, configurations)."""
+        estimator, fixed, default_grid = MODELS[name]
+        candidates = list(ParameterGrid(grid or default_grid))
+        full = self.folds.train_size
+        history = []
+        for samples in self.budgets():
+            if len(candidates) == 1 and samples < full:
+                continue
+            scores = self.scores(name, estimator, fixed, candidates, samples)
+            history.append((samples, len(candidates)))
+            ranked = sorted(range(len(candidates)), key=lambda index: -scores[index])
+            if samples == full:
+                return candidates[ranked[0]], scores[ranked[0]], history
+            candidates = [candidates[index] for index in ranked[:max(1, len(candidates) // self.eta)]]
+
+    def scores(self, name, estimator, fixed, candidates, samples):
+        # Mean accuracy over the folds of every candidate, trained on the first ``samples`` of each fold
+        keys = [[digest(CACHE_VERSION, name, fixed, params, samples, self.folds.key, fold) for fold in range(len(self.folds))]
+                for params in candidates]
+        known = self.cache.get_many([key for row in keys for key in row])
+        missing = [(index, fold) for index, row in enumerate(keys) for fold, key in enumerate(row) if key not in known]
+        results = Parallel(n_jobs=self.n_jobs)(
+            delayed(fit_score)(estimator, fixed, candidates[index], self.folds.folds[fold][0][:samples],
+                               self.folds.folds[fold][1][:samples], *self.folds.folds[fold][2:])
+            for index, fold in missing)
+        self.cache.put_many([(keys[index][fold], score, seconds) for (index, fold), (score, seconds) in zip(missing, results)])
+        for (index, fold), (score, seconds) in zip(missing, results):
+            known[keys[index][fold]] = score
+        self.fits += len(missing)
+        self.cached += sum(len(row) for row in keys) - len(missing)
+        return [float(np.mean([known[key] for key in row])) for row in keys]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune the colour classifiers with successive halving")
+    parser.add_argument("--models", nargs="+", default=list(MODELS), choices=list(MODELS))
+    parser.add_argument("--grid", default=None, help='JSON grid replacing the default one, e.g. \'{"n_neighbors": [3, 5, 23]}\' (needs one model)')
+    parser.add_argument("--eta", type=int, default=3, help="keep the best 1/eta of the configurations each round")
+    parser.add_argument("--min-samples", type=int, default=100, help="training samples per fold in the first round")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel fits, -1 for all cores")
+    parser.add_argument("--cache", default=os.path.join(CACHE_DIRECTORY, "scores.sqlite"))
+    args = parser.parse_args(argv)
+    if args.grid and len(args.models) != 1:
+        parser.error("--grid needs exactly one model")
+
+    X, y = load_colors()
+    # Hold out a test set as the notebook does and tune on the rest
+    X_tune, X_test, y_tune, y_test = train_test_split(X, y, test_size=0.15, random_state=42)
+    folds = Folds(X_tune, y_tune, args.folds, directory=os.path.dirname(args.cache))
+    with ScoreCache(args.cache) as cache:
+        for name in args.models:
+            search = SuccessiveHalving(folds, cache, args.eta, args.min_samples, args.jobs)
+            start = time.perf_counter()
+            params, score, history = search.search(name, json.loads(args.grid) if args.grid else None)
+            seconds = time.perf_counter() - start
+            estimator, fixed, grid = MODELS[name]
+            scaler = MinMaxScaler().fit(X_tune)
+            model = estimator(**fixed, **params).fit(scaler.transform(X_tune), y_tune)
+            test_accuracy = float(np.mean(model.predict(scaler.transform(X_test)) == y_test))
+            print({"model": name, "best_params": params, "cv_accuracy": round(score, 4), "test_accuracy": round(test_accuracy, 4),
+                   "rounds": history, "fits": search.fits, "cached": search.cached, "seconds": round(seconds, 2)})
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,16 @@ class Airline:
         self.name = name
         self.code = code
         self.flights = []
+        self.listeners = []
 
     def add_flight(self, flight: Flight):
         self.flights.append(flight)
+        for listener in self.listeners:
+            listener(flight)
 
     def get_flights(self):
         return self.flights
+
+    def add_listener(self, listener):
+        # listener(flight) is called for every flight added from now on, e.g. to keep a search index up to date
+        self.listeners.append(listener)
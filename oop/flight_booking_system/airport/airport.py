@@ -3,3 +3,15 @@ class Airport:
     def __init__(self, code: str, name: str):
         self.code = code
         self.name = name
+
+    # Airports are identified by their code, so an Airport built from user input matches the scheduled one
+    def __eq__(self, other):
+        if not isinstance(other, Airport):
+            return NotImplemented
+        return self.code == other.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+    def __repr__(self):
+        return f"Airport({self.code!r}, {self.name!r})"
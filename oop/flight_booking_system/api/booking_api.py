@@ -0,0 +1,296 @@
+# api/booking_api.py
+# Run from the flight_booking_system folder: python -m api.booking_api --help
+import argparse
+import asyncio
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from booking.booking_service import BookingService
+from customer.customer import Customer
+from flight.flight_search import FlightSearch
+from loadtest.schedule import generate_schedule
+from services.price_catalogue import DEFAULT_CATALOGUE, FareQuoter, PriceCatalogue
+from storage.booking_store import BookingStore, flight_key
+
+def flight_json(flight) -> dict:
+    return {"flight": flight_key(flight), "flight_number": flight.flight_number, "airline": flight.airline.code,
+            "from": flight.departure_airport.code, "to": flight.arrival_airport.code,
+            "departure_time": f"{flight.departure:%Y-%m-%d %H:%M}", "arrival_time": f"{flight.arrival:%Y-%m-%d %H:%M}",
+            "price": flight.price, "available_seats": flight.available_seats}
+
+class BookingAPI:
+    """The search, quote and book operations behind the socket server, one JSON object per request.
+
+    Identical searches arriving while one is running share its result instead of searching again.
+    Bookings for the same flight that arrive together are handed to ``BookingService.make_bookings`` as
+    one batch, which takes the flight's lock once and shares one group commit. Searches and bookings run
+    on ``executor`` threads, so the event loop never waits for a search, a seat lock or an fsync.
+    """
+
+    def __init__(self, flight_search: FlightSearch, booking_service: BookingService, catalogue: PriceCatalogue = DEFAULT_CATALOGUE, executor: ThreadPoolExecutor = None):
+        self.flight_search = flight_search
+        self.booking_service = booking_service
+        self.catalogue = catalogue
+        self.fare_quoter = FareQuoter(catalogue)
+        self.executor = executor or ThreadPoolExecutor(max_workers=8, thread_name_prefix="booking-api")
+        self.flights = {}
+        for airline in flight_search.airlines:
+            for flight in airline.get_flights():
+                self.flights[flight_key(flight)] = flight
+            airline.add_listener(lambda flight: self.flights.__setitem__(flight_key(flight), flight))
+        self.searches = {}
+        self.pending_bookings = {}
+        self.stats = {"requests": 0, "coalesced": 0, "booking_batches": 0, "bookings": 0}
+
+    async def handle(self, request: dict) -> dict:
+        self.stats["requests"] += 1
+        operation = request.get("op")
+        try:
+            if operation == "search":
+                response = await self.search(request)
+            elif operation == "itineraries":
+                response = await self.itineraries(request)
+            elif operation == "quote":
+                response = self.quote(request)
+            elif operation == "book":
+                response = await self.book(request)
+            elif operation == "seat_map":
+                response = self.seat_map(request)
+            elif operation == "stats":
+                response = dict(self.stats)
+            else:
+                response = {"error": f"Unknown operation: {operation}"}
+        except (KeyError, TypeError, ValueError) as error:
+            response = {"error": f"Bad request: {error}"}
+        except Exception as error:
+            response = {"error": str(error)}
+        if "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    async def search(self, request: dict) -> dict:
+        arguments = (request["from"], request["to"], request.get("earliest"), request.get("latest"),
+                     request.get("min_seats"), request.get("max_price"))
+        flights = await self.coalesce(("search",) + arguments, self.flight_search.search_flights, *arguments)
+        return {"flights": [flight_json(flight) for flight in flights]}
+
+    async def itineraries(self, request: dict) -> dict:
+        arguments = (request["from"], request["to"], request["earliest"], request.get("latest"),
+                     request.get("k", 5), request.get("objective", "arrival"))
+        itineraries = await self.coalesce(("itineraries",) + arguments, self.flight_search.search_itineraries, *arguments)
+        return {"itineraries": [{"flights": [flight_key(flight) for flight in itinerary.flights], "price": itinerary.price,
+                                 "departure_time": f"{itinerary.departure:%Y-%m-%d %H:%M}",
+                                 "arrival_time": f"{itinerary.arrival:%Y-%m-%d %H:%M}"}
+                                for itinerary in itineraries]}
+
+    def quote(self, request: dict) -> dict:
+        """Totals without booking anything.
+
+        "flights" lists itineraries, each a flight key or a list of them, and "options" lists [meal, services]
+        pairs (default: every meal without services); the reply has a row of totals per itinerary. A single
+        "flight" with "meal" and "services" gets a single "total".
+        """
+        if "flights" in request:
+            itineraries = [[self.flights[keys]] if isinstance(keys, str) else [self.flights[key] for key in keys]
+                           for keys in request["flights"]]
+            options = [(meal, services) for meal, services in request.get("options", self.catalogue.options())]
+            return {"totals": self.fare_quoter.quote(itineraries, options).tolist()}
+        total = self.fare_quoter.quote([self.flights[request["flight"]]], [(request.get("meal"), request.get("services", []))])
+        return {"flight": request["flight"], "total": float(total[0, 0])}
+
+    async def book(self, request: dict) -> dict:
+        flight = self.flights[request["flight"]]
+        details = request["customer"]
+        customer = Customer(details["name"], details["contact_info"], details["passport_number"])
+        meal, services = self.extras(request)
+        if request.get("seat"):
+            # A chosen seat is booked on its own
+            booking = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.booking_service.make_booking, customer, flight, meal, services, request["seat"])
+        else:
+            future = asyncio.get_running_loop().create_future()
+            batch = self.pending_bookings.get(flight)
+            if batch is None:
+                batch = self.pending_bookings[flight] = []
+                asyncio.get_running_loop().create_task(self.flush_bookings(flight))
+            batch.append(((customer, meal, services), future))
+            booking = await future
+        return {"booking_id": booking.booking_id, "flight": request["flight"], "seat": booking.seat_number, "total": booking.total_price}
+
+    def seat_map(self, request: dict) -> dict:
+        flight = self.flights[request["flight"]]
+        if getattr(flight, "seat_map", None) is None:
+            return {"error": f"Flight {request['flight']} has no seat map"}
+        return {"flight": request["flight"], "available_seats": flight.available_seats,
+                "rows": [[cabin, row, seats] for cabin, row, seats in flight.seat_map.rows()]}
+
+    async def flush_bookings(self, flight):
+        # Yield once, so every booking for this flight already read from the sockets joins the batch
+        await asyncio.sleep(0)
+        batch = self.pending_bookings.pop(flight)
+        self.stats["booking_batches"] += 1
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.booking_service.make_bookings, flight, [arguments for arguments, future in batch])
+        except Exception as error:
+            results = [error] * len(batch)
+        for (arguments, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                self.stats["bookings"] += 1
+                future.set_result(result)
+
+    async def coalesce(self, key, function, *arguments):
+        future = self.searches.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().run_in_executor(self.executor, function, *arguments)
+        self.searches[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self.searches.get(key) is future:
+                del self.searches[key]
+
+    def extras(self, request: dict):
+        meal = self.catalogue.meal(request.get("meal"))
+        services = [self.catalogue.service(name) for name in request.get("services", [])]
+        return meal, services
+
+class BookingServer:
+    """Line-delimited JSON over TCP: every request line gets one response line.
+
+    Requests on one connection are handled concurrently, so responses may come back out of order;
+    clients match them by the ``id`` they put in the request.
+    """
+
+    def __init__(self, api: BookingAPI, host: str = "127.0.0.1", port: int = 8765, backlog: int = 4096):
+        self.api = api
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.server = None
+        self.connections = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port, backlog=self.backlog)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def respond(self, line: bytes, writer: asyncio.StreamWriter):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            response = {"error": "Request is not valid JSON"}
+        else:
+            response = await self.api.handle(request) if isinstance(request, dict) else {"error": "Request must be a JSON object"}
+        writer.write(json.dumps(response).encode() + b"\n")
+        await writer.drain()
+
+class BookingClient:
+    """Asyncio client of BookingServer that can have many requests outstanding on one connection."""
+
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.waiting = {}
+        self.next_id = 0
+        self.receiver = None
+
+    async def connect(self, host: str = "127.0.0.1", port: int = 8765):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.receiver = asyncio.create_task(self.receive())
+        return self
+
+    async def request(self, **request) -> dict:
+        self.next_id += 1
+        request["id"] = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[self.next_id] = future
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def receive(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.waiting.pop(response.get("id"), None)
+            if future is not None:
+                future.set_result(response)
+        for future in self.waiting.values():
+            future.set_exception(ConnectionError("Connection closed"))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        await self.receiver
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve flight search and booking as line-delimited JSON over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--airports", type=int, default=200)
+    parser.add_argument("--airlines", type=int, default=20)
+    parser.add_argument("--flights", type=int, default=100000, help="flights in the synthetic schedule")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--store", default=None, help="booking store folder (default: a temporary folder)")
+    parser.add_argument("--workers", type=int, default=8, help="executor threads for searches and bookings")
+    parser.add_argument("--no-seat-maps", action="store_true", help="plain seat counts instead of seat maps")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    airports, airlines, flights = generate_schedule(args.airports, args.airlines, args.flights, args.days, seed=args.seed,
+                                                    seat_maps=not args.no_seat_maps)
+    directory = args.store or tempfile.mkdtemp(prefix="booking_api_")
+    store = BookingStore(directory)
+    store.restore_seats(flights)
+    api = BookingAPI(FlightSearch(airlines), BookingService(store=store),
+                     executor=ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="booking-api"))
+
+    async def serve():
+        server = await BookingServer(api, args.host, args.port).start()
+        print(f"Serving {len(flights)} flights on {args.host}:{server.port}, bookings in {directory}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.executor.shutdown()
+        store.close()
+
+if __name__ == "__main__":
+    main()
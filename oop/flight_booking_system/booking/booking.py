@@ -5,12 +5,14 @@ from services.meal_option import MealOption
 from services.additional_service import AdditionalService
 
 class Booking:
-    def __init__(self, customer: Customer, flight: Flight, meal_option: MealOption = None, additional_services: list[AdditionalService] = None):
+    def __init__(self, customer: Customer, flight: Flight, meal_option: MealOption = None, additional_services: list[AdditionalService] = None, seat_number: str = None):
         self.customer = customer
         self.flight = flight
         self.meal_option = meal_option
         self.additional_services = additional_services if additional_services else []
+        self.seat_number = seat_number  # on flights with a seat map
         self.total_price = self.calculate_total_price()
+        self.booking_id = None  # assigned once the booking is stored
 
     def calculate_total_price(self):
         total = self.flight.price
@@ -2,14 +2,81 @@
 from booking.booking import Booking
 from flight.flight import Flight
 from customer.customer import Customer
+from inventory.seat_inventory import SeatInventory, NoSeatsAvailable
 from services.meal_option import MealOption
 from services.additional_service import AdditionalService
 
 class BookingService:
-    def make_booking(self, customer: Customer, flight: Flight, meal_option: MealOption = None, additional_services: list[AdditionalService] = None) -> Booking:
-        if flight.available_seats > 0:
-            flight.book_seat()
-            booking = Booking(customer, flight, meal_option, additional_services)
-            return booking
+    def __init__(self, inventory: SeatInventory = None, store=None):
+        self.inventory = inventory if inventory else SeatInventory()
+        # Optional storage.booking_store.BookingStore, bookings are only confirmed once they are durable
+        self.store = store
+
+    def make_booking(self, customer: Customer, flight: Flight, meal_option: MealOption = None, additional_services: list[AdditionalService] = None, seat_number: str = None) -> Booking:
+        # The seat is held atomically first and only confirmed once the booking exists.
+        # seat_number picks the seat on flights with a seat map, otherwise the first free one is given.
+        # A sold out flight or a taken seat raises NoSeatsAvailable.
+        try:
+            hold = self.inventory.reserve(flight, seat_numbers=[seat_number] if seat_number else None)
+        except NoSeatsAvailable:
+            if seat_number:
+                raise NoSeatsAvailable(f"Seat {seat_number} is not available on this flight")
+            raise NoSeatsAvailable("No seats available on this flight")
+        try:
+            booking = Booking(customer, flight, meal_option, additional_services, hold.seat_numbers[0] if hold.seat_numbers else None)
+            if self.store:
+                booking.booking_id = self.store.record_booking(booking)
+        except Exception:
+            self.inventory.release(hold)
+            raise
+        self.inventory.confirm(hold)
+        return booking
+
+    def make_bookings(self, flight: Flight, requests: list[tuple[Customer, MealOption, list[AdditionalService]]], adjacent: bool = False) -> list:
+        """Book one seat per (customer, meal_option, additional_services) request on ``flight`` with a single hold.
+
+        Returns a Booking or an Exception per request, in request order. When the flight has fewer free
+        seats than requests, the first requests get them and the rest fail. With a store, all bookings
+        are submitted before waiting, so they share one group commit; a booking the store fails to write
+        gets its Exception and its seat back, the others are still confirmed. On flights with a seat map the
+        seats are side by side when possible; with ``adjacent`` the group is seated together or not at all.
+        """
+        # Ask for every seat first, the reservation hands expired holds back before counting free seats
+        seats = len(requests)
+        hold = None
+        while seats > 0 and hold is None:
+            try:
+                hold = self.inventory.reserve(flight, seats, adjacent=adjacent)
+            except NoSeatsAvailable:
+                if adjacent:
+                    break
+                seats = min(seats - 1, flight.available_seats)
+        results = [NoSeatsAvailable("No seats available on this flight") for _ in requests]
+        if hold is None:
+            return results
+        seat_numbers = hold.seat_numbers or [None] * seats
+        try:
+            bookings = [Booking(customer, flight, meal_option, additional_services, seat_number)
+                        for (customer, meal_option, additional_services), seat_number in zip(requests[:seats], seat_numbers)]
+        except Exception:
+            self.inventory.release(hold)
+            raise
+        failed = []
+        if self.store:
+            futures = [self.store.submit(booking) for booking in bookings]
+            # Each booking stands on its own: the durable ones keep their seats, only the failed ones give theirs back
+            for index, (booking, future) in enumerate(zip(bookings, futures)):
+                try:
+                    booking.booking_id = future.result()
+                except Exception as error:
+                    results[index] = error
+                    failed.append(booking)
+                else:
+                    results[index] = booking
         else:
-            raise Exception("No seats available on this flight")
+            results[:seats] = bookings
+        if failed:
+            self.inventory.shrink(hold, len(failed), [booking.seat_number for booking in failed if booking.seat_number])
+        if len(failed) < seats:
+            self.inventory.confirm(hold)
+        return results
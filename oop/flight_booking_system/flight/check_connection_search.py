@@ -0,0 +1,74 @@
+# flight/check_connection_search.py
+# Run from the flight_booking_system folder: python -m flight.check_connection_search
+import argparse
+import random
+import sys
+from datetime import timedelta
+from flight.connection_search import OBJECTIVES, ConnectionSearch
+from flight.flight_index import FlightIndex
+from loadtest.schedule import generate_schedule
+
+def brute_force(index: FlightIndex, search: ConnectionSearch, origin: str, destination: str, earliest, latest, k: int, objective: str) -> list[tuple]:
+    """Objective keys of the best ``k`` itineraries, found by enumerating every itinerary."""
+    key = OBJECTIVES[objective]
+    found = []
+
+    def walk(legs, price, visited):
+        last = legs[-1]
+        airport = last.arrival_airport.code
+        if airport == destination:
+            found.append(key(last.arrival, price, len(legs)))
+            return
+        if len(legs) == search.max_legs:
+            return
+        for flight in index.departures(airport, last.arrival + search.min_connection, last.arrival + search.max_connection):
+            if flight.available_seats > 0 and flight.arrival_airport.code not in visited:
+                walk(legs + [flight], price + flight.price, visited | {flight.arrival_airport.code})
+
+    for flight in index.departures(origin, earliest, latest):
+        if flight.available_seats > 0:
+            walk([flight], flight.price, {origin, flight.arrival_airport.code})
+    return sorted(found)[:k]
+
+def compare(schedules: int, airports: int, flights: int, queries: int, k: int, seed: int) -> dict:
+    """Run ``queries`` searches per objective on each random schedule and count top-k results that differ."""
+    mismatches = {objective: 0 for objective in OBJECTIVES}
+    total = 0
+    for number in range(schedules):
+        rng = random.Random(seed * 1000 + number)
+        airport_list, airlines, flight_list = generate_schedule(airports, 2, flights, 3, seed=seed * 1000 + number)
+        # Some sold out flights, which the search has to skip
+        for flight in rng.sample(flight_list, len(flight_list) // 10):
+            flight.available_seats = 0
+        index = FlightIndex(flight_list)
+        search = ConnectionSearch(index)
+        start = min(flight.departure for flight in flight_list)
+        for _ in range(queries):
+            origin, destination = rng.sample([airport.code for airport in airport_list], 2)
+            earliest = start + timedelta(hours=rng.randrange(48))
+            latest = earliest + timedelta(hours=rng.randrange(1, 24))
+            for objective in OBJECTIVES:
+                expected = brute_force(index, search, origin, destination, earliest, latest, k, objective)
+                got = [OBJECTIVES[objective](itinerary.arrival, itinerary.price, itinerary.legs)
+                       for itinerary in search.search(origin, destination, earliest, latest, k, objective)]
+                mismatches[objective] += got != expected
+                total += 1
+    return {"schedules": schedules, "queries": total, "mismatches": mismatches}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare ConnectionSearch with exhaustive enumeration on random schedules")
+    parser.add_argument("--schedules", type=int, default=40)
+    parser.add_argument("--airports", type=int, default=6)
+    parser.add_argument("--flights", type=int, default=120, help="flights per schedule, over three days")
+    parser.add_argument("--queries", type=int, default=5, help="queries per schedule and objective")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = compare(args.schedules, args.airports, args.flights, args.queries, args.k, args.seed)
+    print(report)
+    if any(report["mismatches"].values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# flight/connection_search.py
+import heapq
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from flight.flight import Flight, parse_time
+from flight.flight_index import FlightIndex, airport_code, window
+
+class Itinerary:
+    def __init__(self, flights: list[Flight]):
+        self.flights = flights
+        self.price = sum(flight.price for flight in flights)
+
+    @property
+    def departure(self) -> datetime:
+        return self.flights[0].departure
+
+    @property
+    def arrival(self) -> datetime:
+        return self.flights[-1].arrival
+
+    @property
+    def legs(self) -> int:
+        return len(self.flights)
+
+    @property
+    def duration(self) -> timedelta:
+        return self.arrival - self.departure
+
+    def __repr__(self):
+        numbers = " > ".join(flight.flight_number for flight in self.flights)
+        return f"Itinerary({numbers}, {self.departure} to {self.arrival}, ${self.price})"
+
+# Sort key of an itinerary for each objective, ties broken by the other two criteria
+OBJECTIVES = {
+    "arrival": lambda arrival, price, legs: (arrival, price, legs),
+    "price": lambda arrival, price, legs: (price, arrival, legs),
+    "legs": lambda arrival, price, legs: (legs, arrival, price),
+}
+
+class ConnectionSearch:
+    """Top-k itineraries of up to ``max_legs`` flights, read straight from a FlightIndex.
+
+    The index already holds every airport's departures sorted by time, so nothing is rebuilt per query
+    and flights added to the index are found by the next search. The search is best-first over partial
+    itineraries ordered by the objective; arrival time, total price and leg count only grow as legs are
+    added, so the first k complete itineraries taken off the heap are the best k.
+
+    A partial itinerary is dropped once k others reached the same airport no later, in no more legs and
+    for no more money, but only those that can take every onward flight it can: their connection
+    window must still be open at the last departure inside its own window, and the airports they
+    visited must all have been visited by it too, so no onward airport is barred to them.
+    ``check_connection_search`` compares the results with exhaustive enumeration.
+    """
+
+    def __init__(self, index: FlightIndex, min_connection: timedelta = timedelta(minutes=45), max_connection: timedelta = timedelta(hours=12), max_legs: int = 3):
+        self.index = index
+        self.min_connection = min_connection
+        self.max_connection = max_connection
+        self.max_legs = max_legs
+
+    def search(self, departure_airport, arrival_airport, earliest, latest=None, k: int = 5, objective: str = "arrival", max_legs: int = None) -> list[Itinerary]:
+        """Best ``k`` itineraries whose first flight departs between ``earliest`` and ``latest`` (default: one day later).
+
+        ``objective`` is "arrival" (earliest arrival), "price" (lowest total price) or "legs" (fewest flights).
+        Sold out flights and itineraries visiting an airport twice are skipped.
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective: {objective}")
+        key = OBJECTIVES[objective]
+        origin, destination = airport_code(departure_airport), airport_code(arrival_airport)
+        max_legs = max_legs or self.max_legs
+        earliest = parse_time(earliest)
+        latest = parse_time(latest) if latest is not None else earliest + timedelta(days=1)
+
+        heap = []
+        counter = 0
+        # airport -> (arrival, legs, price, visited airports) of every partial itinerary expanded from it
+        expanded = {}
+        itineraries = []
+
+        def extend(legs, price, airport, start, end):
+            nonlocal counter
+            remaining = max_legs - len(legs)
+            # The last allowed flight has to land at the destination, so only that route is read
+            table = self.index.routes.get((airport, destination)) if remaining == 1 else self.index.airports.get(airport)
+            if table is None:
+                return
+            visited = {leg.departure_airport.code for leg in legs}
+            visited.add(airport)
+            for flight in window(table, start, end):
+                if flight.available_seats <= 0 or flight.arrival_airport.code in visited:
+                    continue
+                total = price + flight.price
+                counter += 1
+                heapq.heappush(heap, (key(flight.arrival, total, len(legs) + 1), counter, legs + (flight,), total))
+
+        extend((), 0.0, origin, earliest, latest)
+        while heap and len(itineraries) < k:
+            _, _, legs, price = heapq.heappop(heap)
+            last = legs[-1]
+            airport = last.arrival_airport.code
+            if airport == destination:
+                itineraries.append(Itinerary(list(legs)))
+                continue
+            reached = expanded.setdefault(airport, [])
+            visited = frozenset(leg.departure_airport.code for leg in legs)
+            # The last flight this partial itinerary could connect to; a dominating one must still reach it
+            last_onward = self.last_departure(airport, last.arrival + self.max_connection)
+            if sum(1 for arrival, count, cost, seen in reached
+                   if arrival <= last.arrival and count <= len(legs) and cost <= price
+                   and (last_onward is None or arrival + self.max_connection >= last_onward)
+                   and seen <= visited) >= k:
+                continue
+            reached.append((last.arrival, len(legs), price, visited))
+            extend(legs, price, airport, last.arrival + self.min_connection, last.arrival + self.max_connection)
+        return itineraries
+
+    def last_departure(self, airport: str, latest: datetime) -> datetime:
+        # Latest departure from the airport at or before ``latest``, None if there is none
+        table = self.index.airports.get(airport)
+        if table is None:
+            return None
+        position = bisect_right(table[0], latest)
+        return table[0][position - 1] if position else None
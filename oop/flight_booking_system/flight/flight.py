@@ -1,8 +1,18 @@
 # flight/flight.py
+import threading
+from datetime import datetime
 from airport.airport import Airport
+from flight.seat_map import SeatMap
+
+def parse_time(value) -> datetime:
+    # Accepts a datetime or a "YYYY-MM-DD HH:MM" string
+    if isinstance(value, datetime):
+        return value
+    # fromisoformat reads this format far faster than strptime
+    return datetime.fromisoformat(value)
 
 class Flight:
-    def __init__(self, flight_number: str, airline, departure_airport: Airport, arrival_airport: Airport, departure_time: str, arrival_time: str, price: float, available_seats: int):
+    def __init__(self, flight_number: str, airline, departure_airport: Airport, arrival_airport: Airport, departure_time: str, arrival_time: str, price: float, available_seats: int, seat_map: SeatMap = None):
         self.flight_number = flight_number
         self.airline = airline
         self.departure_airport = departure_airport
@@ -10,10 +20,61 @@ class Flight:
         self.departure_time = departure_time
         self.arrival_time = arrival_time
         self.price = price
-        self.available_seats = available_seats
+        # Bumped on every seat change, so cached search results can tell they are out of date
+        self.version = 0
+        # Called with the flight after every seat change, see add_listener
+        self.listeners = None
+        self._available_seats = available_seats
+        # With a seat map, available_seats is counted from it and seats change through take_seats / release_seats
+        self.seat_map = seat_map
+
+        # Parsed once here so searches compare timestamps instead of strings
+        self.departure = parse_time(departure_time)
+        self.arrival = parse_time(arrival_time)
+
+        # Guards available_seats, shared with the seat inventory so both update it atomically
+        self.seat_lock = threading.Lock()
+
+    @property
+    def available_seats(self) -> int:
+        if self.seat_map is not None:
+            return self.seat_map.free_count
+        return self._available_seats
+
+    @available_seats.setter
+    def available_seats(self, value: int):
+        if self.seat_map is not None:
+            raise AttributeError(f"Flight {self.flight_number} has a seat map, take or release seats instead")
+        self._available_seats = value
+        self._changed()
+
+    def take_seats(self, seat_numbers: list[str]):
+        # Caller holds seat_lock
+        self.seat_map.take(seat_numbers)
+        self._changed()
+
+    def release_seats(self, seat_numbers: list[str]):
+        # Caller holds seat_lock
+        self.seat_map.release(seat_numbers)
+        self._changed()
+
+    def add_listener(self, listener):
+        # listener(flight) is called after every seat change, e.g. to mark the cached searches of its route stale
+        if self.listeners is None:
+            self.listeners = []
+        self.listeners.append(listener)
+
+    def _changed(self):
+        self.version += 1
+        if self.listeners:
+            for listener in self.listeners:
+                listener(self)
 
     def book_seat(self):
-        if self.available_seats > 0:
-            self.available_seats -= 1
-        else:
-            raise Exception("No seats available")
+        with self.seat_lock:
+            if self.available_seats <= 0:
+                raise Exception("No seats available")
+            if self.seat_map is not None:
+                self.take_seats(self.seat_map.find_free(1))
+            else:
+                self.available_seats -= 1
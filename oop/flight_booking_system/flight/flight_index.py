@@ -0,0 +1,88 @@
+# flight/flight_index.py
+import itertools
+from bisect import bisect_left, bisect_right
+from flight.flight import Flight, parse_time
+
+def airport_code(airport) -> str:
+    # Accepts an Airport or a plain airport code
+    return getattr(airport, "code", airport)
+
+def window(table, earliest=None, latest=None) -> list[Flight]:
+    # Flights of a (times, flights) table departing between earliest and latest inclusive
+    times, flights = table
+    start = 0 if earliest is None else bisect_left(times, earliest)
+    end = len(times) if latest is None else bisect_right(times, latest)
+    return flights[start:end]
+
+class FlightIndex:
+    """Flights grouped by (departure code, arrival code) and by departure code, sorted by departure time.
+
+    Every group keeps two parallel lists, departure times and flights, so a time window is two
+    binary searches and a slice no matter how many flights are scheduled.
+    """
+
+    def __init__(self, flights: list[Flight] = None):
+        self.routes = {}
+        self.airports = {}
+        # Changed whenever a flight is added to the route or the seats of one of its flights change.
+        # Every change stores a new number from one counter, so even two changes racing on a route
+        # leave a value that no search has read before.
+        self.route_versions = {}
+        self.changes = itertools.count(1)
+        self.count = 0
+        if flights:
+            self.add_flights(flights)
+
+    def add_flight(self, flight: Flight):
+        for table in (self.routes.setdefault(self.route_of(flight), ([], [])),
+                      self.airports.setdefault(flight.departure_airport.code, ([], []))):
+            times, flights = table
+            # Insert after flights departing at the same time, so equal times keep their insertion order
+            position = bisect_right(times, flight.departure)
+            times.insert(position, flight.departure)
+            flights.insert(position, flight)
+        self.route_changed(flight)
+        flight.add_listener(self.route_changed)
+        self.count += 1
+
+    def add_flights(self, flights: list[Flight]):
+        # Bulk load: append everything, then sort each touched group once
+        touched = []
+        for flight in flights:
+            for tables, key in ((self.routes, self.route_of(flight)), (self.airports, flight.departure_airport.code)):
+                table = tables.setdefault(key, ([], []))
+                table[1].append(flight)
+                touched.append(table)
+            self.route_changed(flight)
+            flight.add_listener(self.route_changed)
+            self.count += 1
+        for times, group in {id(table): table for table in touched}.values():
+            group.sort(key=lambda flight: flight.departure)
+            times[:] = [flight.departure for flight in group]
+
+    def search(self, departure_airport, arrival_airport, earliest=None, latest=None) -> list[Flight]:
+        """Flights on the route departing between ``earliest`` and ``latest`` inclusive, in departure order.
+
+        Airports may be given as Airport objects or codes, times as datetimes or "YYYY-MM-DD HH:MM" strings.
+        """
+        route = self.routes.get((airport_code(departure_airport), airport_code(arrival_airport)))
+        if route is None:
+            return []
+        return window(route, earliest and parse_time(earliest), latest and parse_time(latest))
+
+    def departures(self, departure_airport, earliest=None, latest=None) -> list[Flight]:
+        """Flights to any airport departing between ``earliest`` and ``latest`` inclusive, in departure order."""
+        table = self.airports.get(airport_code(departure_airport))
+        if table is None:
+            return []
+        return window(table, earliest and parse_time(earliest), latest and parse_time(latest))
+
+    def route_changed(self, flight: Flight):
+        self.route_versions[self.route_of(flight)] = next(self.changes)
+
+    @staticmethod
+    def route_of(flight: Flight) -> tuple[str, str]:
+        return flight.departure_airport.code, flight.arrival_airport.code
+
+    def __len__(self):
+        return self.count
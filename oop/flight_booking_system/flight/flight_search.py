@@ -1,16 +1,44 @@
 # flight/flight_search.py
 from airport.airport import Airport
 from airline.airline import Airline
-from flight.flight import Flight
+from flight.connection_search import ConnectionSearch, Itinerary
+from flight.flight import Flight, parse_time
+from flight.flight_index import FlightIndex, airport_code
+from flight.search_cache import SearchCache
 
 class FlightSearch:
-    def __init__(self, airlines: list[Airline]):
+    def __init__(self, airlines: list[Airline], cache: SearchCache = None):
         self.airlines = airlines
+        # Built once from the current schedule, then kept up to date as airlines add flights
+        self.index = FlightIndex()
+        for airline in airlines:
+            self.index.add_flights(airline.get_flights())
+            airline.add_listener(self.index.add_flight)
+        self.connections = ConnectionSearch(self.index)
+        self.cache = cache
 
-    def search_flights(self, departure_airport: Airport, arrival_airport: Airport) -> list[Flight]:
-        available_flights = []
-        for airline in self.airlines:
-            for flight in airline.get_flights():
-                if flight.departure_airport == departure_airport and flight.arrival_airport == arrival_airport:
-                    available_flights.append(flight)
-        return available_flights
+    def search_flights(self, departure_airport: Airport, arrival_airport: Airport, earliest=None, latest=None, min_seats: int = None, max_price: float = None) -> list[Flight]:
+        """Flights on the route departing in the window, optionally only those with ``min_seats`` free and up to ``max_price``."""
+        if self.cache is None:
+            return self._filter(self.index.search(departure_airport, arrival_airport, earliest, latest), min_seats, max_price)
+        route = (airport_code(departure_airport), airport_code(arrival_airport))
+        # A string and a datetime for the same time share an entry
+        key = (route, earliest and parse_time(earliest), latest and parse_time(latest), min_seats, max_price)
+        # Read first: a seat change during the search then shows up as a stale entry
+        route_version = self.index.route_versions.get(route, 0)
+        flights = self.cache.get(key, route_version)
+        if flights is None:
+            flights = self._filter(self.index.search(departure_airport, arrival_airport, earliest, latest), min_seats, max_price)
+            self.cache.put(key, flights, route_version)
+        return list(flights)
+
+    def search_itineraries(self, departure_airport: Airport, arrival_airport: Airport, earliest, latest=None, k: int = 5, objective: str = "arrival") -> list[Itinerary]:
+        return self.connections.search(departure_airport, arrival_airport, earliest, latest, k, objective)
+
+    @staticmethod
+    def _filter(flights: list[Flight], min_seats: int = None, max_price: float = None) -> list[Flight]:
+        if min_seats is not None:
+            flights = [flight for flight in flights if flight.available_seats >= min_seats]
+        if max_price is not None:
+            flights = [flight for flight in flights if flight.price <= max_price]
+        return flights
@@ -0,0 +1,286 @@
+# flight/flight_table.py
+import csv
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from airline.airline import Airline
+from airport.airport import Airport
+from flight.flight import parse_time
+
+EPOCH = datetime(1970, 1, 1)
+COLUMNS = ["flight_number", "airline", "departure_airport", "arrival_airport", "departure_time", "arrival_time", "price", "available_seats"]
+
+# Rows share this many seat locks, a lock per row would cost more memory than the row itself
+LOCK_STRIPES = 256
+
+def to_minutes(value) -> int:
+    return (parse_time(value) - EPOCH) // timedelta(minutes=1)
+
+def from_minutes(minutes) -> datetime:
+    return EPOCH + timedelta(minutes=int(minutes))
+
+class Interner:
+    # Each distinct value is stored once, the columns hold its index
+    def __init__(self):
+        self.values = []
+        self.indices = {}
+
+    def index(self, value) -> int:
+        index = self.indices.get(value)
+        if index is None:
+            index = self.indices[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def indices_of(self, values) -> np.ndarray:
+        return np.fromiter((self.index(value) for value in values), dtype=np.int32, count=len(values))
+
+class FlightRow:
+    """View of one row of a FlightTable that reads like a Flight.
+
+    Works wherever a Flight is read: FlightSearch, ConnectionSearch, Booking, SeatInventory and MainUI.
+    Seat changes are written straight into the table's seat column.
+    """
+
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: "FlightTable", row: int):
+        self.table = table
+        self.row = row
+
+    @property
+    def flight_number(self) -> str:
+        return self.table.flight_numbers.values[self.table.flight_number[self.row]]
+
+    @property
+    def airline(self) -> Airline:
+        return self.table.airlines[self.table.airline[self.row]]
+
+    @property
+    def departure_airport(self) -> Airport:
+        return self.table.airports[self.table.departure_airport[self.row]]
+
+    @property
+    def arrival_airport(self) -> Airport:
+        return self.table.airports[self.table.arrival_airport[self.row]]
+
+    @property
+    def departure(self) -> datetime:
+        return from_minutes(self.table.departure[self.row])
+
+    @property
+    def arrival(self) -> datetime:
+        return from_minutes(self.table.arrival[self.row])
+
+    @property
+    def departure_time(self) -> str:
+        return f"{self.departure:%Y-%m-%d %H:%M}"
+
+    @property
+    def arrival_time(self) -> str:
+        return f"{self.arrival:%Y-%m-%d %H:%M}"
+
+    @property
+    def price(self) -> float:
+        return float(self.table.price[self.row])
+
+    @property
+    def available_seats(self) -> int:
+        return int(self.table.seats[self.row])
+
+    @available_seats.setter
+    def available_seats(self, value: int):
+        self.table.seats[self.row] = value
+        self._changed()
+
+    @property
+    def seat_map(self) -> None:
+        # The table keeps a seat count per row only, so rows are booked without seat numbers
+        return None
+
+    @property
+    def version(self) -> int:
+        return int(self.table.versions[self.row])
+
+    @property
+    def seat_lock(self):
+        return self.table.locks[self.row % LOCK_STRIPES]
+
+    def book_seat(self):
+        with self.seat_lock:
+            if self.table.seats[self.row] > 0:
+                self.table.seats[self.row] -= 1
+                self._changed()
+            else:
+                raise Exception("No seats available")
+
+    def add_listener(self, listener):
+        # Same as Flight.add_listener, the listeners are kept by the table
+        self.table.listeners.setdefault(self.row, []).append(listener)
+
+    def _changed(self):
+        self.table.versions[self.row] += 1
+        for listener in self.table.listeners.get(self.row, ()):
+            listener(self)
+
+    # Two views of the same row are the same flight, e.g. as SeatInventory keys
+    def __eq__(self, other):
+        if not isinstance(other, FlightRow):
+            return NotImplemented
+        return self.table is other.table and self.row == other.row
+
+    def __hash__(self):
+        return hash((id(self.table), self.row))
+
+    def __repr__(self):
+        return f"FlightRow({self.flight_number}, {self.departure_airport.code}->{self.arrival_airport.code}, {self.departure_time})"
+
+class FlightTable:
+    """A schedule stored as one NumPy column per field.
+
+    Airport, airline and flight number strings are interned and stored as int32 indices, times as int32
+    minutes since 1970, so a flight takes 40 bytes instead of a Flight object with its dict, strings,
+    datetimes and lock. ``select`` filters the whole schedule with vectorized comparisons and
+    ``rows`` hands out FlightRow views.
+    """
+
+    def __init__(self, flight_number, airline, departure_airport, arrival_airport, departure, arrival, price, seats,
+                 flight_numbers: Interner, airlines: list[Airline], airports: list[Airport]):
+        self.flight_number = np.asarray(flight_number, dtype=np.int32)
+        self.airline = np.asarray(airline, dtype=np.int32)
+        self.departure_airport = np.asarray(departure_airport, dtype=np.int32)
+        self.arrival_airport = np.asarray(arrival_airport, dtype=np.int32)
+        self.departure = np.asarray(departure, dtype=np.int32)
+        self.arrival = np.asarray(arrival, dtype=np.int32)
+        self.price = np.asarray(price, dtype=np.float64)
+        self.seats = np.asarray(seats, dtype=np.int32)
+        self.versions = np.zeros(len(self.seats), dtype=np.int32)
+        # row -> listeners of FlightRow.add_listener, only for rows that have any
+        self.listeners = {}
+        self.flight_numbers = flight_numbers
+        self.airlines = airlines
+        self.airports = airports
+        self.airport_codes = {airport.code: index for index, airport in enumerate(airports)}
+        self.locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    @classmethod
+    def from_columns(cls, columns: dict, airlines: list[Airline] = None, airports: list[Airport] = None) -> "FlightTable":
+        """Build a table from equally long sequences named as in ``COLUMNS``.
+
+        Airlines and airports are looked up by code in the lists given, missing ones are created with
+        their code as name. Times may be "YYYY-MM-DD HH:MM" strings, datetimes or datetime64 values.
+        """
+        airline_by_code = {airline.code: airline for airline in airlines or []}
+        airport_by_code = {airport.code: airport for airport in airports or []}
+        flight_numbers, airline_codes, airport_codes = Interner(), Interner(), Interner()
+        table_airlines, table_airports = [], []
+
+        airline = airline_codes.indices_of(list(columns["airline"]))
+        for code in airline_codes.values:
+            table_airlines.append(airline_by_code.get(code) or Airline(code, code))
+        departure_airport = airport_codes.indices_of(list(columns["departure_airport"]))
+        arrival_airport = airport_codes.indices_of(list(columns["arrival_airport"]))
+        for code in airport_codes.values:
+            table_airports.append(airport_by_code.get(code) or Airport(code, code))
+
+        return cls(flight_numbers.indices_of(list(columns["flight_number"])), airline, departure_airport, arrival_airport,
+                   cls.minutes(columns["departure_time"]), cls.minutes(columns["arrival_time"]),
+                   columns["price"], columns["available_seats"], flight_numbers, table_airlines, table_airports)
+
+    @classmethod
+    def from_flights(cls, flights: list) -> "FlightTable":
+        return cls.from_columns({
+            "flight_number": [flight.flight_number for flight in flights],
+            "airline": [flight.airline.code for flight in flights],
+            "departure_airport": [flight.departure_airport.code for flight in flights],
+            "arrival_airport": [flight.arrival_airport.code for flight in flights],
+            "departure_time": [flight.departure for flight in flights],
+            "arrival_time": [flight.arrival for flight in flights],
+            "price": [flight.price for flight in flights],
+            "available_seats": [flight.available_seats for flight in flights],
+        }, list({flight.airline.code: flight.airline for flight in flights}.values()),
+           list({airport.code: airport for flight in flights for airport in (flight.departure_airport, flight.arrival_airport)}.values()))
+
+    @classmethod
+    def from_csv(cls, path: str, airlines: list[Airline] = None, airports: list[Airport] = None) -> "FlightTable":
+        """Load a CSV file with a header row naming the ``COLUMNS``."""
+        with open(path, newline="") as file:
+            reader = csv.reader(file)
+            header = next(reader)
+            columns = {name: [] for name in header}
+            appenders = [columns[name].append for name in header]
+            for record in reader:
+                for append, value in zip(appenders, record):
+                    append(value)
+        columns["price"] = np.array(columns["price"], dtype=np.float64)
+        columns["available_seats"] = np.array(columns["available_seats"], dtype=np.int32)
+        return cls.from_columns(columns, airlines, airports)
+
+    @classmethod
+    def from_parquet(cls, path: str, airlines: list[Airline] = None, airports: list[Airport] = None) -> "FlightTable":
+        # Needs pyarrow, which is only imported here
+        import pyarrow.parquet
+        data = pyarrow.parquet.read_table(path, columns=COLUMNS)
+        return cls.from_columns({name: data.column(name).to_numpy(zero_copy_only=False) for name in COLUMNS},
+                                airlines, airports)
+
+    def to_csv(self, path: str):
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            departure = self.departure.astype("datetime64[m]").astype(str)
+            arrival = self.arrival.astype("datetime64[m]").astype(str)
+            numbers = self.flight_numbers.values
+            for row in range(len(self)):
+                writer.writerow([numbers[self.flight_number[row]], self.airlines[self.airline[row]].code,
+                                 self.airports[self.departure_airport[row]].code, self.airports[self.arrival_airport[row]].code,
+                                 departure[row].replace("T", " "), arrival[row].replace("T", " "),
+                                 self.price[row], self.seats[row]])
+
+    @staticmethod
+    def minutes(values) -> np.ndarray:
+        # Epoch minutes of strings, datetimes or datetime64 values, parsed in one vectorized call
+        values = np.asarray(values)
+        if values.dtype.kind != "M":
+            values = values.astype("datetime64[m]")
+        return values.astype("datetime64[m]").astype(np.int64).astype(np.int32)
+
+    def select(self, departure_airport=None, arrival_airport=None, earliest=None, latest=None, max_price: float = None, min_seats: int = None) -> np.ndarray:
+        """Row numbers matching every filter given, in table order; airports by object or code, times inclusive."""
+        mask = np.ones(len(self), dtype=bool)
+        for column, airport in ((self.departure_airport, departure_airport), (self.arrival_airport, arrival_airport)):
+            if airport is not None:
+                index = self.airport_codes.get(getattr(airport, "code", airport))
+                if index is None:
+                    return np.empty(0, dtype=np.intp)
+                mask &= column == index
+        if earliest is not None:
+            mask &= self.departure >= to_minutes(earliest)
+        if latest is not None:
+            mask &= self.departure <= to_minutes(latest)
+        if max_price is not None:
+            mask &= self.price <= max_price
+        if min_seats is not None:
+            mask &= self.seats >= min_seats
+        return np.flatnonzero(mask)
+
+    def rows(self, indices=None) -> list[FlightRow]:
+        if indices is None:
+            indices = range(len(self))
+        return [FlightRow(self, int(row)) for row in indices]
+
+    def search(self, departure_airport, arrival_airport, earliest=None, latest=None) -> list[FlightRow]:
+        # Same result as FlightSearch.search_flights, in departure order
+        indices = self.select(departure_airport, arrival_airport, earliest, latest)
+        return self.rows(indices[np.argsort(self.departure[indices], kind="stable")])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in (self.flight_number, self.airline, self.departure_airport, self.arrival_airport,
+                                                self.departure, self.arrival, self.price, self.seats, self.versions))
+
+    def __len__(self):
+        return len(self.departure)
+
+    def __getitem__(self, row: int) -> FlightRow:
+        return FlightRow(self, row)
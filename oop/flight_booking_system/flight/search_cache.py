@@ -0,0 +1,74 @@
+# flight/search_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+class SearchEntry:
+    # A cached result with the route version it was computed from
+    def __init__(self, flights: list, route_version: int, expires_at: float):
+        self.flights = flights
+        self.route_version = route_version
+        self.expires_at = expires_at
+
+    def is_current(self, route_version: int) -> bool:
+        # Still valid while no flight was added to the route and no seats on it changed
+        return route_version == self.route_version
+
+class SearchCache:
+    """LRU cache of search results with a time to live, safe to share between threads.
+
+    Entries are checked against the route version of the FlightIndex, which changes with every new
+    flight and every seat change on the route, so a cached result is never returned after a booking,
+    a released seat or a new flight could have changed it, and a hit costs one comparison. Counters tell how well the cache is sized.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, key, route_version: int):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= self.clock():
+                self.expired += 1
+            elif not entry.is_current(route_version):
+                self.stale += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry.flights
+            del self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, flights: list, route_version: int):
+        """Cache ``flights``, searched after ``route_version`` was read."""
+        entry = SearchEntry(flights, route_version, self.clock() + self.ttl)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self.entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0, "stale": self.stale,
+                    "expired": self.expired, "evictions": self.evictions}
@@ -0,0 +1,157 @@
+# flight/seat_map.py
+import re
+
+SEAT_NUMBER = re.compile(r"(\d+)([A-Z])")
+
+class Cabin:
+    """Rows ``first_row`` to ``last_row`` sharing one row plan, e.g. "ABC DEFG HJK" with spaces for aisles.
+
+    Inside a cabin bitset every row takes ``stride`` bits: one per letter, one per aisle and one after
+    the row. Aisle and row-end bits are never set, so set bits next to each other are always seats next
+    to each other.
+    """
+
+    def __init__(self, name: str, first_row: int, last_row: int, plan: str):
+        self.name = name
+        self.first_row = first_row
+        self.last_row = last_row
+        self.plan = plan
+        self.letter_bits = {letter: bit for bit, letter in enumerate(plan) if letter != " "}
+        self.bit_letters = {bit: letter for letter, bit in self.letter_bits.items()}
+        self.stride = len(plan) + 1
+        row_bits = sum(1 << bit for bit in self.letter_bits.values())
+        self.all_seats = sum(row_bits << (row * self.stride) for row in range(last_row - first_row + 1))
+        self.seats = self.all_seats.bit_count()
+        self.nbytes = ((last_row - first_row + 1) * self.stride + 7) // 8
+
+    def bit(self, row: int, letter: str) -> int:
+        return (row - self.first_row) * self.stride + self.letter_bits[letter]
+
+    def seat_number(self, bit: int) -> str:
+        return f"{self.first_row + bit // self.stride}{self.bit_letters[bit % self.stride]}"
+
+# Business 1-2-1, premium 2-4-2 and economy 3-4-3
+WIDE_BODY = [Cabin("Business", 1, 8, "A DG K"), Cabin("Premium", 10, 15, "AC DEFG HK"), Cabin("Economy", 20, 62, "ABC DEFG HJK")]
+NARROW_BODY = [Cabin("Business", 1, 4, "AC DF"), Cabin("Economy", 5, 32, "ABC DEF")]
+
+# Row -> cabin index of every layout in use, shared by all the seat maps of that layout
+_ROW_CABINS = {}
+
+def row_cabins(cabins: list[Cabin]) -> dict[int, int]:
+    key = tuple(cabins)
+    rows = _ROW_CABINS.get(key)
+    if rows is None:
+        rows = _ROW_CABINS[key] = {row: index for index, cabin in enumerate(cabins) for row in range(cabin.first_row, cabin.last_row + 1)}
+    return rows
+
+class SeatMap:
+    """The free seats of one flight as a bitset per cabin, a set bit for every free seat.
+
+    Finding N adjacent free seats in a cabin ANDs the bitset with shifted copies of itself, doubling the
+    run length each time, until a bit is left only where N free seats start; the lowest such bit is the
+    frontmost, leftmost group. That is about log2(N) operations on a few hundred bit integer, no loop
+    over rows or seats. The caller serialises changes, SeatInventory does so under the flight's seat_lock.
+    """
+
+    def __init__(self, cabins: list[Cabin], free: list[int] = None):
+        self.cabins = cabins
+        self.free = list(free) if free is not None else [cabin.all_seats for cabin in cabins]
+        self.free_count = sum(bits.bit_count() for bits in self.free)
+        self.capacity = sum(cabin.seats for cabin in cabins)
+        self.row_cabins = row_cabins(cabins)
+
+    def find_adjacent(self, seats: int, cabin: str = None) -> list[str]:
+        """The first ``seats`` free seats side by side in one row, or None if no row has them."""
+        for index in self.cabin_indices(cabin):
+            runs = self.free[index]
+            length = 1
+            while length < seats and runs:
+                step = min(length, seats - length)
+                runs &= runs >> step
+                length += step
+            if runs:
+                start = (runs & -runs).bit_length() - 1
+                return [self.cabins[index].seat_number(start + offset) for offset in range(seats)]
+        return None
+
+    def find_free(self, seats: int, cabin: str = None) -> list[str]:
+        """The first ``seats`` free seats wherever they are, or None if there are fewer."""
+        found = []
+        for index in self.cabin_indices(cabin):
+            bits = self.free[index]
+            while bits and len(found) < seats:
+                lowest = bits & -bits
+                found.append(self.cabins[index].seat_number(lowest.bit_length() - 1))
+                bits ^= lowest
+        return found if len(found) == seats else None
+
+    def is_free(self, seat_numbers: list[str]) -> bool:
+        return all(self.free[index] >> bit & 1 for index, bit in map(self.locate, seat_numbers))
+
+    def take(self, seat_numbers: list[str]):
+        located = [self.locate(seat_number) for seat_number in seat_numbers]
+        if len(set(located)) != len(located) or not all(self.free[index] >> bit & 1 for index, bit in located):
+            raise ValueError(f"Seats {', '.join(seat_numbers)} are not all free")
+        for index, bit in located:
+            self.free[index] &= ~(1 << bit)
+        self.free_count -= len(located)
+
+    def release(self, seat_numbers: list[str]):
+        located = [self.locate(seat_number) for seat_number in seat_numbers]
+        if len(set(located)) != len(located) or any(self.free[index] >> bit & 1 for index, bit in located):
+            raise ValueError(f"Seats {', '.join(seat_numbers)} are not all taken")
+        for index, bit in located:
+            self.free[index] |= 1 << bit
+        self.free_count += len(located)
+
+    def taken(self) -> list[str]:
+        """Every taken seat, front to back."""
+        found = []
+        for cabin, bits in zip(self.cabins, self.free):
+            bits ^= cabin.all_seats
+            while bits:
+                lowest = bits & -bits
+                found.append(cabin.seat_number(lowest.bit_length() - 1))
+                bits ^= lowest
+        return found
+
+    def locate(self, seat_number: str) -> tuple[int, int]:
+        # "12C" -> (cabin index, bit in that cabin's bitset)
+        match = SEAT_NUMBER.fullmatch(seat_number)
+        index = self.row_cabins.get(int(match.group(1))) if match else None
+        if index is None or match.group(2) not in self.cabins[index].letter_bits:
+            raise ValueError(f"No seat {seat_number} on this aircraft")
+        return index, self.cabins[index].bit(int(match.group(1)), match.group(2))
+
+    def cabin_indices(self, cabin: str = None) -> list[int]:
+        if cabin is None:
+            return range(len(self.cabins))
+        indices = [index for index, candidate in enumerate(self.cabins) if candidate.name == cabin]
+        if not indices:
+            raise ValueError(f"No cabin {cabin} on this aircraft")
+        return indices
+
+    def to_bytes(self) -> bytes:
+        # The cabin bitsets back to back, little endian; the layout itself is not included
+        return b"".join(bits.to_bytes(cabin.nbytes, "little") for cabin, bits in zip(self.cabins, self.free))
+
+    @classmethod
+    def from_bytes(cls, cabins: list[Cabin], data: bytes) -> "SeatMap":
+        free, offset = [], 0
+        for cabin in cabins:
+            free.append(int.from_bytes(data[offset:offset + cabin.nbytes], "little") & cabin.all_seats)
+            offset += cabin.nbytes
+        return cls(cabins, free)
+
+    def rows(self) -> list[tuple[str, int, str]]:
+        """(cabin, row, seats) for display, seats as the row plan with "." for every taken seat."""
+        rows = []
+        for cabin, bits in zip(self.cabins, self.free):
+            for row in range(cabin.first_row, cabin.last_row + 1):
+                row_bits = bits >> ((row - cabin.first_row) * cabin.stride)
+                rows.append((cabin.name, row, "".join(letter if letter == " " or row_bits >> bit & 1 else "."
+                                                      for bit, letter in enumerate(cabin.plan))))
+        return rows
+
+    def render(self) -> str:
+        return "\n".join(f"{row:>3} {seats}" for cabin, row, seats in self.rows())
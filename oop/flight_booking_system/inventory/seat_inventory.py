@@ -0,0 +1,197 @@
+# inventory/seat_inventory.py
+import heapq
+import itertools
+import time
+from contextlib import ExitStack
+from flight.flight import Flight
+
+class NoSeatsAvailable(Exception):
+    pass
+
+class Hold:
+    def __init__(self, hold_id: int, flight: Flight, seats: int, expires_at: float, seat_numbers: list[str] = None):
+        self.hold_id = hold_id
+        self.flight = flight
+        self.seats = seats
+        self.expires_at = expires_at
+        # The seats held, on flights with a seat map
+        self.seat_numbers = seat_numbers if seat_numbers else []
+        self.state = "held"  # then "confirmed", "released" or "expired"
+
+class SeatInventory:
+    """Reserve / confirm / release seats with holds that expire.
+
+    A hold takes its seats out of ``Flight.available_seats`` straight away and gives them back when it is
+    released or expires, so searches never offer held seats. Every change is made under the flight's own
+    ``seat_lock``: bookings on different flights never wait for each other, and the check and the
+    decrement can no longer be interleaved by another booking.
+
+    On flights with a seat map a hold takes actual seats: the ones asked for, otherwise the first free
+    seats side by side, otherwise (unless ``adjacent``) the first free seats anywhere.
+    """
+
+    def __init__(self, hold_seconds: float = 600.0, clock=time.monotonic):
+        self.hold_seconds = hold_seconds
+        self.clock = clock
+        self.hold_ids = itertools.count(1)
+        # flight -> heap of (expires_at, hold_id, hold), only touched under that flight's seat_lock
+        self.expiries = {}
+        # flight -> confirmed or released holds still in its heap, which is compacted once they are half of it
+        self.finished = {}
+
+    def reserve(self, flight: Flight, seats: int = 1, hold_seconds: float = None, seat_numbers: list[str] = None, adjacent: bool = False) -> Hold:
+        with flight.seat_lock:
+            return self._reserve(flight, seats, hold_seconds, self.clock(), seat_numbers, adjacent)
+
+    def reserve_many(self, requests: list[tuple[Flight, int]], hold_seconds: float = None) -> list[Hold]:
+        """Hold seats on several flights at once, all or nothing; returns one hold per request."""
+        needed = {}
+        for flight, seats in requests:
+            if seats <= 0:
+                raise ValueError("At least one seat must be reserved")
+            needed[flight] = needed.get(flight, 0) + seats
+        # Always take the locks in the same order, so two batches can never deadlock.
+        # Flights may share a lock (FlightTable rows do), each lock is taken once.
+        flights = list(needed)
+        with ExitStack() as locks:
+            for lock in sorted({id(flight.seat_lock): flight.seat_lock for flight in flights}.items()):
+                locks.enter_context(lock[1])
+            now = self.clock()
+            for flight in flights:
+                self._expire(flight, now)
+                if flight.available_seats < needed[flight]:
+                    raise NoSeatsAvailable(f"Only {flight.available_seats} seats available on flight {flight.flight_number}")
+            return [self._reserve(flight, seats, hold_seconds, now) for flight, seats in requests]
+
+    def confirm(self, hold: Hold):
+        with hold.flight.seat_lock:
+            self._expire(hold.flight, self.clock())
+            if hold.state != "held":
+                raise Exception(f"Hold {hold.hold_id} on flight {hold.flight.flight_number} is {hold.state}")
+            hold.state = "confirmed"
+            self._finish(hold)
+
+    def release(self, hold: Hold):
+        # Releasing a hold that is no longer held (already confirmed, released or expired) does nothing
+        with hold.flight.seat_lock:
+            if hold.state == "held":
+                hold.state = "released"
+                self._give_back(hold)
+                self._finish(hold)
+
+    def shrink(self, hold: Hold, seats: int, seat_numbers: list[str] = None):
+        """Give back ``seats`` seats of a hold that is still held, on flights with a seat map the ``seat_numbers`` ones.
+
+        The rest of the hold stays held; a hold shrunk to no seats is released.
+        """
+        with hold.flight.seat_lock:
+            if hold.state != "held":
+                return
+            if hold.seat_numbers:
+                if not seat_numbers or len(seat_numbers) != seats or not set(seat_numbers) <= set(hold.seat_numbers):
+                    raise ValueError(f"Seats to give back must be {seats} seats of hold {hold.hold_id}")
+                hold.flight.release_seats(seat_numbers)
+                hold.seat_numbers = [seat for seat in hold.seat_numbers if seat not in seat_numbers]
+            else:
+                hold.flight.available_seats += seats
+            hold.seats -= seats
+            if hold.seats <= 0:
+                hold.state = "released"
+                self._finish(hold)
+
+    def confirm_many(self, holds: list[Hold]):
+        for hold in holds:
+            self.confirm(hold)
+
+    def release_many(self, holds: list[Hold]):
+        for hold in holds:
+            self.release(hold)
+
+    def book(self, flight: Flight, seats: int = 1, seat_numbers: list[str] = None, adjacent: bool = False) -> Hold:
+        # Reserve and confirm in one step
+        with flight.seat_lock:
+            now = self.clock()
+            seat_numbers = self._take(flight, seats, now, seat_numbers, adjacent)
+        hold = Hold(next(self.hold_ids), flight, len(seat_numbers) or seats, now, seat_numbers)
+        hold.state = "confirmed"
+        return hold
+
+    def expire_holds(self) -> int:
+        """Return the seats of every expired hold now instead of at the flight's next reservation."""
+        now = self.clock()
+        expired = 0
+        for flight in list(self.expiries):
+            with flight.seat_lock:
+                expired += self._expire(flight, now)
+        return expired
+
+    def _take(self, flight, seats, now, seat_numbers=None, adjacent=False):
+        # Caller holds flight.seat_lock. Returns the seats taken, none on flights without a seat map.
+        if seat_numbers:
+            seats = len(seat_numbers)
+        if seats <= 0:
+            raise ValueError("At least one seat must be reserved")
+        self._expire(flight, now)
+        # FlightRow has no seat map
+        seat_map = getattr(flight, "seat_map", None)
+        if seat_map is None:
+            if seat_numbers:
+                raise ValueError(f"Flight {flight.flight_number} has no seat map")
+            if flight.available_seats < seats:
+                raise NoSeatsAvailable(f"Only {flight.available_seats} seats available on flight {flight.flight_number}")
+            flight.available_seats -= seats
+            return []
+        if seat_numbers:
+            if not seat_map.is_free(seat_numbers):
+                raise NoSeatsAvailable(f"Seats {', '.join(seat_numbers)} are not all free on flight {flight.flight_number}")
+        else:
+            seat_numbers = seat_map.find_adjacent(seats)
+            if seat_numbers is None and not adjacent:
+                seat_numbers = seat_map.find_free(seats)
+            if seat_numbers is None:
+                together = " adjacent" if adjacent else ""
+                raise NoSeatsAvailable(f"No {seats}{together} seats available on flight {flight.flight_number}")
+        flight.take_seats(seat_numbers)
+        return seat_numbers
+
+    def _give_back(self, hold):
+        # Caller holds hold.flight.seat_lock
+        if hold.seat_numbers:
+            hold.flight.release_seats(hold.seat_numbers)
+        else:
+            hold.flight.available_seats += hold.seats
+
+    def _reserve(self, flight, seats, hold_seconds, now, seat_numbers=None, adjacent=False):
+        # Caller holds flight.seat_lock
+        seat_numbers = self._take(flight, seats, now, seat_numbers, adjacent)
+        hold = Hold(next(self.hold_ids), flight, len(seat_numbers) or seats, now + (self.hold_seconds if hold_seconds is None else hold_seconds), seat_numbers)
+        heapq.heappush(self.expiries.setdefault(flight, []), (hold.expires_at, hold.hold_id, hold))
+        return hold
+
+    def _expire(self, flight, now):
+        # Caller holds flight.seat_lock. Confirmed and released holds at the front of the heap are dropped too.
+        heap = self.expiries.get(flight)
+        expired = 0
+        while heap and (heap[0][0] <= now or heap[0][2].state != "held"):
+            hold = heapq.heappop(heap)[2]
+            if hold.state == "held":
+                hold.state = "expired"
+                self._give_back(hold)
+                expired += 1
+            else:
+                self.finished[flight] -= 1
+        return expired
+
+    def _finish(self, hold):
+        # Caller holds hold.flight.seat_lock, the hold has just been confirmed or released
+        flight = hold.flight
+        heap = self.expiries.get(flight)
+        if not heap:
+            return
+        finished = self.finished.get(flight, 0) + 1
+        if finished * 2 > len(heap):
+            # Mostly dead entries, rebuild the heap from the holds still held
+            heap[:] = [entry for entry in heap if entry[2].state == "held"]
+            heapq.heapify(heap)
+            finished = 0
+        self.finished[flight] = finished
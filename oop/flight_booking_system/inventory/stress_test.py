@@ -0,0 +1,171 @@
+# inventory/stress_test.py
+# Run from the flight_booking_system folder: python -m inventory.stress_test
+import argparse
+import random
+import sys
+import threading
+import time
+from airline.airline import Airline
+from airport.airport import Airport
+from flight.flight import Flight
+from flight.seat_map import SeatMap, WIDE_BODY
+from inventory.seat_inventory import SeatInventory, NoSeatsAvailable
+
+def make_flights(count: int, seats: int, layout: list = None) -> list[Flight]:
+    # With a layout every flight gets its own seat map and ``seats`` is ignored
+    airline = Airline("Stress Airlines", "ST")
+    departure, arrival = Airport("AAA", "Departure"), Airport("BBB", "Arrival")
+    return [Flight(f"ST{number}", airline, departure, arrival, "2024-09-01 08:00", "2024-09-01 11:00", 100.0, seats,
+                   SeatMap(layout) if layout else None)
+            for number in range(count)]
+
+def run_threads(threads: int, target) -> float:
+    # Start every worker together and return the wall time until the last one finishes
+    barrier = threading.Barrier(threads + 1)
+    workers = [threading.Thread(target=lambda index=index: (barrier.wait(), target(index))) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+def oversell_test(threads: int, flights: int, seats: int, attempts: int, check_then_act: bool) -> dict:
+    """Many threads book, hold, release and batch-book the same few flights; count seats sold beyond capacity.
+
+    With ``check_then_act`` the old BookingService logic is used instead of the inventory, for comparison.
+    """
+    schedule = make_flights(flights, seats)
+    inventory = SeatInventory(hold_seconds=0.001)
+    sold = [0] * flights
+    sold_lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(index)
+        for _ in range(attempts):
+            number = rng.randrange(flights)
+            flight = schedule[number]
+            if check_then_act:
+                if flight.available_seats > 0:
+                    time.sleep(0)  # let another thread run between the check and the act, as under load
+                    flight.available_seats -= 1
+                    with sold_lock:
+                        sold[number] += 1
+                continue
+            action = rng.random()
+            try:
+                if action < 0.5:
+                    inventory.book(flight)
+                    booked = [number]
+                elif action < 0.8:
+                    # Held seats are either confirmed, released or left to expire
+                    hold = inventory.reserve(flight)
+                    choice = rng.random()
+                    if choice < 0.4:
+                        inventory.confirm(hold)
+                        booked = [number]
+                    else:
+                        if choice < 0.7:
+                            inventory.release(hold)
+                        booked = []
+                else:
+                    other = rng.randrange(flights)
+                    holds = inventory.reserve_many([(flight, 1), (schedule[other], 1)])
+                    inventory.confirm_many(holds)
+                    booked = [number, other]
+            except NoSeatsAvailable:
+                booked = []
+            except Exception:
+                # Confirming a hold that expired in the meantime
+                booked = []
+            with sold_lock:
+                for booked_number in booked:
+                    sold[booked_number] += 1
+
+    seconds = run_threads(threads, worker)
+    time.sleep(0.002)
+    inventory.expire_holds()
+    oversold = sum(max(count - seats, 0) for count in sold)
+    # Every seat is either sold or available again once all holds are gone
+    lost = sum(seats - count - flight.available_seats for count, flight in zip(sold, schedule))
+    return {"threads": threads, "check_then_act": check_then_act, "sold": sum(sold), "oversold": oversold,
+            "unaccounted": lost, "seconds": round(seconds, 3)}
+
+def throughput_test(threads: int, operations: int) -> dict:
+    """Each thread books and releases seats on its own flight, so the threads never share a lock."""
+    schedule = make_flights(threads, operations)
+    inventory = SeatInventory()
+
+    def worker(index):
+        flight = schedule[index]
+        for _ in range(operations):
+            inventory.release(inventory.reserve(flight))
+
+    seconds = run_threads(threads, worker)
+    return {"threads": threads, "operations": threads * operations, "seconds": round(seconds, 3),
+            "operations_per_second": round(threads * operations / seconds)}
+
+def group_booking_test(threads: int, flights: int, attempts: int, max_group: int) -> dict:
+    """Threads hold, confirm and release groups of up to ``max_group`` seats on wide-body seat maps.
+
+    Afterwards no seat may be held twice and every flight's available_seats must equal the free seats
+    of its map, i.e. the capacity less the seats of the confirmed groups.
+    """
+    schedule = make_flights(flights, 0, WIDE_BODY)
+    inventory = SeatInventory()
+    confirmed = [[] for _ in range(threads)]
+
+    def worker(index):
+        rng = random.Random(index)
+        for _ in range(attempts):
+            flight = schedule[rng.randrange(flights)]
+            group = rng.randint(1, max_group)
+            try:
+                hold = inventory.reserve(flight, group)
+            except NoSeatsAvailable:
+                continue
+            if rng.random() < 0.3:
+                inventory.release(hold)
+                continue
+            inventory.confirm(hold)
+            confirmed[index].append(hold)
+
+    seconds = run_threads(threads, worker)
+    holds = [hold for holds in confirmed for hold in holds]
+    seats = [(id(hold.flight), seat_number) for hold in holds for seat_number in hold.seat_numbers]
+    capacity = schedule[0].seat_map.capacity
+    sold = {}
+    for hold in holds:
+        sold[id(hold.flight)] = sold.get(id(hold.flight), 0) + hold.seats
+    inconsistent = sum(flight.available_seats != capacity - sold.get(id(flight), 0) or
+                       flight.available_seats != sum(bits.bit_count() for bits in flight.seat_map.free)
+                       for flight in schedule)
+    # Groups with all their seats in one row
+    together = sum(len({seat_number[:-1] for seat_number in hold.seat_numbers}) == 1 for hold in holds)
+    return {"threads": threads, "flights": flights, "groups": len(holds), "seated_together": together, "seats": len(seats),
+            "double_booked": len(seats) - len(set(seats)), "inconsistent_flights": inconsistent,
+            "seconds": round(seconds, 3), "attempts_per_second": round(threads * attempts / seconds)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress test the seat inventory for oversells and throughput")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--flights", type=int, default=4, help="flights shared by all threads in the oversell test")
+    parser.add_argument("--seats", type=int, default=50)
+    parser.add_argument("--attempts", type=int, default=2000, help="booking attempts per thread in the oversell test")
+    parser.add_argument("--operations", type=int, default=50000, help="reserve/release pairs per thread in the throughput test")
+    parser.add_argument("--group-attempts", type=int, default=5000, help="group holds per thread in the seat map test")
+    parser.add_argument("--max-group", type=int, default=9, help="largest group in the seat map test")
+    args = parser.parse_args(argv)
+
+    # A short switch interval makes the threads interleave as often as possible
+    sys.setswitchinterval(1e-6)
+    for check_then_act in (True, False):
+        print(oversell_test(max(args.threads), args.flights, args.seats, args.attempts, check_then_act))
+    sys.setswitchinterval(0.005)
+    for threads in args.threads:
+        print(throughput_test(threads, args.operations))
+    print(group_booking_test(max(args.threads), args.flights, args.group_attempts, args.max_group))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# loadtest/load_test.py
+# Run from the flight_booking_system folder: python -m loadtest.load_test --help
+import argparse
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+import numpy as np
+from booking.booking_service import BookingService
+from customer.customer import Customer
+from flight.flight_search import FlightSearch
+from flight.search_cache import SearchCache
+from inventory.seat_inventory import NoSeatsAvailable
+from loadtest.schedule import generate_schedule
+from services.meal_option import MealOption
+from storage.booking_store import BookingStore
+
+OPERATIONS = ("search", "itinerary", "book")
+
+def summarize(latencies: list[float], errors: int, seconds: float) -> dict:
+    report = {"count": len(latencies), "errors": errors,
+              "per_second": round(len(latencies) / seconds, 1) if seconds > 0 else 0.0}
+    if latencies:
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        report.update(p50_ms=round(p50 * 1000, 4), p90_ms=round(p90 * 1000, 4), p99_ms=round(p99 * 1000, 4),
+                      max_ms=round(max(latencies) * 1000, 4))
+    return report
+
+class LoadTest:
+    """Drive FlightSearch and BookingService from many threads with a fixed mix of operations.
+
+    ``mix`` maps "search" (direct flights on a route in a one day window), "itinerary" (top-5 multi-leg
+    search) and "book" (one seat on a random flight) to their share of the operations.
+    """
+
+    def __init__(self, flights: list, flight_search: FlightSearch, booking_service: BookingService, mix: dict, seed: int = 0):
+        self.flights = flights
+        self.flight_search = flight_search
+        self.booking_service = booking_service
+        self.operations = [operation for operation in OPERATIONS if mix.get(operation)]
+        self.cumulative = list(np.cumsum([mix[operation] for operation in self.operations]))
+        self.seed = seed
+        self.start_time = min(flight.departure for flight in flights)
+        self.days = max((max(flight.departure for flight in flights) - self.start_time).days, 1)
+        self.meal = MealOption("Vegetarian", 20.0)
+
+    def run(self, threads: int, operations: int = None, duration: float = None) -> dict:
+        """Run ``operations`` per thread, or for ``duration`` seconds, and return the report."""
+        results = [None] * threads
+        failures = []
+        barrier = threading.Barrier(threads + 1)
+
+        def worker(index):
+            barrier.wait()
+            try:
+                results[index] = self.worker(index, operations, duration)
+            except Exception as error:
+                failures.append(error)
+
+        workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+        for thread in workers:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        seconds = time.perf_counter() - start
+        # Anything but a sold out flight is a bug in the system or the harness, not a load result
+        if failures:
+            raise failures[0]
+
+        report = {"threads": threads, "seconds": round(seconds, 3), "operations": {}}
+        total = 0
+        for operation in self.operations:
+            latencies = [latency for result in results for latency in result[operation][0]]
+            errors = sum(result[operation][1] for result in results)
+            report["operations"][operation] = summarize(latencies, errors, seconds)
+            total += len(latencies)
+        report["per_second"] = round(total / seconds, 1) if seconds > 0 else 0.0
+        return report
+
+    def worker(self, index: int, operations: int, duration: float) -> dict:
+        rng = random.Random(self.seed * 1000 + index)
+        results = {operation: ([], 0) for operation in self.operations}
+        deadline = time.perf_counter() + duration if duration else None
+        done = 0
+        while (operations is None or done < operations) and (deadline is None or time.perf_counter() < deadline):
+            operation = rng.choices(self.operations, cum_weights=self.cumulative)[0]
+            call = self.request(operation, rng, index, done)
+            start = time.perf_counter()
+            try:
+                call()
+                failed = False
+            except NoSeatsAvailable:
+                # Sold out flights are part of the load, they are counted, not raised
+                failed = True
+            latency = time.perf_counter() - start
+            latencies, errors = results[operation]
+            latencies.append(latency)
+            results[operation] = (latencies, errors + failed)
+            done += 1
+        return results
+
+    def request(self, operation: str, rng: random.Random, worker: int, number: int):
+        # Pick the random inputs before the clock starts, so only the call itself is timed
+        if operation == "book":
+            flight = rng.choice(self.flights)
+            customer = Customer(f"Load {worker}-{number}", "load@example.com", f"L{worker:03d}{number:09d}")
+            meal = self.meal if rng.random() < 0.5 else None
+            return lambda: self.booking_service.make_booking(customer, flight, meal)
+        # Search routes that exist, picked through a random flight so busy routes are searched more
+        flight = rng.choice(self.flights)
+        earliest = self.start_time + timedelta(days=rng.randrange(self.days))
+        if operation == "search":
+            return lambda: self.flight_search.search_flights(flight.departure_airport, flight.arrival_airport, earliest, earliest + timedelta(days=1))
+        destination = rng.choice(self.flights).arrival_airport
+        return lambda: self.flight_search.search_itineraries(flight.departure_airport, destination, earliest)
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of ``report`` against ``baseline``: throughput down or p99 latency up by more than ``tolerance``."""
+    regressions = []
+    for operation, current in report["operations"].items():
+        previous = baseline["operations"].get(operation)
+        if not previous:
+            continue
+        if current["per_second"] < previous["per_second"] * (1 - tolerance):
+            regressions.append(f"{operation}: {current['per_second']}/s, was {previous['per_second']}/s")
+        if "p99_ms" in current and "p99_ms" in previous and current["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{operation}: p99 {current['p99_ms']} ms, was {previous['p99_ms']} ms")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless load test of flight search and booking")
+    parser.add_argument("--airports", type=int, default=200)
+    parser.add_argument("--airlines", type=int, default=20)
+    parser.add_argument("--flights", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16], help="thread counts to run, one report each")
+    parser.add_argument("--operations", type=int, default=2000, help="operations per thread")
+    parser.add_argument("--duration", type=float, default=None, help="seconds per run instead of a fixed operation count")
+    parser.add_argument("--search", type=float, default=0.8, help="share of direct flight searches")
+    parser.add_argument("--itinerary", type=float, default=0.1, help="share of multi-leg itinerary searches")
+    parser.add_argument("--book", type=float, default=0.1, help="share of bookings")
+    parser.add_argument("--cache-size", type=int, default=0, help="put a SearchCache of this many entries in front of the search")
+    parser.add_argument("--store", action="store_true", help="make bookings durable in a temporary BookingStore")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="JSON report file, '-' for stdout (default)")
+    parser.add_argument("--baseline", default=None, help="earlier JSON report; exit with status 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    airports, airlines, flights = generate_schedule(args.airports, args.airlines, args.flights, args.days, seed=args.seed)
+    generated = time.perf_counter() - start
+    start = time.perf_counter()
+    cache = SearchCache(args.cache_size) if args.cache_size else None
+    flight_search = FlightSearch(airlines, cache)
+    indexed = time.perf_counter() - start
+
+    store = None
+    if args.store:
+        store = BookingStore(tempfile.mkdtemp(prefix="load_test_"))
+    booking_service = BookingService(store=store)
+    mix = {"search": args.search, "itinerary": args.itinerary, "book": args.book}
+    load_test = LoadTest(flights, flight_search, booking_service, mix, args.seed)
+    try:
+        runs = [load_test.run(threads, None if args.duration else args.operations, args.duration) for threads in args.threads]
+    finally:
+        if store is not None:
+            store.close()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "setup_seconds": {"generate": round(generated, 3), "index": round(indexed, 3)},
+        "runs": runs,
+    }
+    if cache is not None:
+        report["cache"] = cache.stats()
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    json.dump(report, out, indent=2)
+    out.write("\n")
+    if out is not sys.stdout:
+        out.close()
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = []
+        for run, previous in zip(runs, baseline["runs"]):
+            regressions += [f"{run['threads']} threads, {regression}" for regression in compare(run, previous, args.tolerance)]
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# loadtest/schedule.py
+import random
+import string
+from itertools import accumulate
+from datetime import datetime, timedelta
+from airline.airline import Airline
+from airport.airport import Airport
+from flight.flight import Flight
+from flight.seat_map import NARROW_BODY, WIDE_BODY, SeatMap
+
+def airport_codes(count: int) -> list[str]:
+    # AAA, AAB, ... enough three letter codes for 17576 airports
+    letters = string.ascii_uppercase
+    return [letters[index // 676 % 26] + letters[index // 26 % 26] + letters[index % 26] for index in range(count)]
+
+def generate_schedule(airports: int = 200, airlines: int = 20, flights: int = 100000, days: int = 30, start: datetime = datetime(2024, 9, 1), seats: tuple[int, int] = (50, 300), seed: int = 0, seat_maps: bool = False):
+    """Synthetic airports, airlines and flights, each flight added to its airline.
+
+    Airport traffic follows a Zipf-like popularity, so a few hubs carry most flights like a real network.
+    With ``seat_maps`` every flight gets a seat map instead of its seat count: a WIDE_BODY where the count
+    drawn is 200 or more, otherwise a NARROW_BODY. The schedule is otherwise the same for the same seed.
+    Returns (airports, airlines, flights).
+    """
+    rng = random.Random(seed)
+    airport_list = [Airport(code, f"{code} International Airport") for code in airport_codes(airports)]
+    airline_list = [Airline(f"Airline {code}", code) for code in airport_codes(airlines)]
+    cumulative = list(accumulate(1 / (rank + 1) for rank in range(airports)))
+    minutes = days * 24 * 60
+    flight_list = []
+    for number in range(flights):
+        departure_airport, arrival_airport = rng.choices(airport_list, cum_weights=cumulative, k=2)
+        while arrival_airport is departure_airport:
+            arrival_airport = rng.choices(airport_list, cum_weights=cumulative)[0]
+        airline = airline_list[number % airlines]
+        # Whole five minute slots, like a real timetable
+        departure = start + timedelta(minutes=rng.randrange(0, minutes, 5))
+        arrival = departure + timedelta(minutes=rng.randrange(45, 15 * 60, 5))
+        price, seat_count = float(rng.randrange(49, 1500)), rng.randint(*seats)
+        seat_map = SeatMap(WIDE_BODY if seat_count >= 200 else NARROW_BODY) if seat_maps else None
+        flight = Flight(f"{airline.code}{number}", airline, departure_airport, arrival_airport,
+                        f"{departure:%Y-%m-%d %H:%M}", f"{arrival:%Y-%m-%d %H:%M}", price, seat_count, seat_map)
+        airline.add_flight(flight)
+        flight_list.append(flight)
+    return airport_list, airline_list, flight_list
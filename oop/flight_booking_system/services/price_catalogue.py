@@ -0,0 +1,88 @@
+# services/price_catalogue.py
+import numpy as np
+from services.additional_service import AdditionalService
+from services.meal_option import MealOption
+
+class PriceCatalogue:
+    """The meals and additional services on sale, with their prices kept in NumPy arrays for quoting.
+
+    Meal index 0 is "no meal" at 0.0, so a list of options can always be turned into indices.
+    """
+
+    def __init__(self, meals: list[MealOption], services: list[AdditionalService] = None):
+        self.meals = {meal.name: meal for meal in meals}
+        self.services = {service.name: service for service in services or []}
+        self.meal_indices = {name: index for index, name in enumerate(self.meals, 1)}
+        self.service_indices = {name: index for index, name in enumerate(self.services)}
+        self.meal_prices = np.array([0.0] + [meal.price for meal in self.meals.values()])
+        self.service_prices = np.array([service.price for service in self.services.values()])
+
+    def meal(self, name: str) -> MealOption:
+        # None, "" or "None" for no meal
+        return self.meals[name] if self.meal_index(name) else None
+
+    def service(self, name: str) -> AdditionalService:
+        if name not in self.services:
+            raise ValueError(f"Unknown additional service: {name}")
+        return self.services[name]
+
+    def meal_index(self, name: str) -> int:
+        if not name or name == "None":
+            return 0
+        if name not in self.meal_indices:
+            raise ValueError(f"Unknown meal option: {name}")
+        return self.meal_indices[name]
+
+    def service_index(self, name: str) -> int:
+        if name not in self.service_indices:
+            raise ValueError(f"Unknown additional service: {name}")
+        return self.service_indices[name]
+
+    def extras(self, options: list[tuple[str, list[str]]]) -> np.ndarray:
+        """Meal plus services price of every (meal name or None, service names) option, per flight."""
+        meals = np.fromiter((self.meal_index(meal) for meal, services in options), dtype=np.intp, count=len(options))
+        # One row per option, one column per service, set where the option includes the service
+        chosen = np.zeros((len(options), len(self.service_prices)))
+        for row, (meal, services) in enumerate(options):
+            for name in services:
+                chosen[row, self.service_index(name)] += 1
+        return self.meal_prices[meals] + chosen @ self.service_prices
+
+    def options(self, services: list[list[str]] = None) -> list[tuple[str, list[str]]]:
+        # Every meal choice, including none, with every service list given (default: no services)
+        return [(meal, list(chosen)) for chosen in services or [[]] for meal in [None] + list(self.meals)]
+
+class FareQuoter:
+    """Totals of many itineraries under many meal / service options in one call, as a NumPy matrix.
+
+    A total is what booking every flight of the itinerary with that option would cost, the same sum as
+    ``Booking.calculate_total_price``. No Booking is created and no seat is held.
+    """
+
+    def __init__(self, catalogue: PriceCatalogue):
+        self.catalogue = catalogue
+
+    def quote(self, itineraries: list, options: list[tuple[str, list[str]]] = None) -> np.ndarray:
+        """(itineraries x options) matrix of totals; options default to every meal without services.
+
+        An itinerary is an Itinerary, a list of flights or a single flight.
+        """
+        options = options if options is not None else self.catalogue.options()
+        fares, legs = self.fares(itineraries)
+        return fares[:, None] + legs[:, None] * self.catalogue.extras(options)[None, :]
+
+    @staticmethod
+    def fares(itineraries: list) -> tuple[np.ndarray, np.ndarray]:
+        # Ticket price and number of flights of every itinerary
+        fares = np.empty(len(itineraries))
+        legs = np.empty(len(itineraries))
+        for row, itinerary in enumerate(itineraries):
+            flights = getattr(itinerary, "flights", itinerary)
+            if not isinstance(flights, (list, tuple)):
+                flights = [flights]
+            fares[row] = sum(flight.price for flight in flights)
+            legs[row] = len(flights)
+        return fares, legs
+
+# The meals the desktop UI and the booking API offer
+DEFAULT_CATALOGUE = PriceCatalogue([MealOption("Vegetarian", 20.0), MealOption("Non-Vegetarian", 20.0)])
@@ -0,0 +1,91 @@
+# storage/benchmark_store.py
+# Run from the flight_booking_system folder: python -m storage.benchmark_store
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from booking.booking import Booking
+from customer.customer import Customer
+from inventory.stress_test import make_flights
+from services.meal_option import MealOption
+from storage.booking_store import BookingStore, SNAPSHOT_NAME
+
+def make_bookings(count: int, flights: int = 100) -> list[Booking]:
+    schedule = make_flights(flights, count)
+    meal = MealOption("Vegetarian", 20.0)
+    return [Booking(Customer(f"Customer {number}", f"customer{number}@example.com", f"P{number:08d}"),
+                    schedule[number % flights], meal if number % 2 else None)
+            for number in range(count)]
+
+def throughput(directory: str, bookings: list[Booking], batch_size: int, clients: int) -> dict:
+    """Bookings per second with ``clients`` threads each waiting for its own booking to be durable."""
+    shutil.rmtree(directory, ignore_errors=True)
+    store = BookingStore(directory, batch_size=batch_size, snapshot_every=0)
+    per_client = len(bookings) // clients
+
+    def client(index):
+        for booking in bookings[index * per_client:(index + 1) * per_client]:
+            store.record_booking(booking)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    store.close()
+    count = per_client * clients
+    return {"batch_size": batch_size, "clients": clients, "bookings": count, "seconds": round(seconds, 3),
+            "bookings_per_second": round(count / seconds), "average_batch": round(count / max(store.batches, 1), 1)}
+
+def recovery(directory: str, count: int, tail: float) -> dict:
+    """Time opening a ``count`` booking log, with a snapshot covering all but ``tail`` of it and without one."""
+    shutil.rmtree(directory, ignore_errors=True)
+    bookings = make_bookings(10000)
+    store = BookingStore(directory, batch_size=4096, snapshot_every=0, fsync=False)
+    snapshot_at = int(count * (1 - tail))
+    for number in range(count):
+        future = store.submit(bookings[number % len(bookings)])
+        if number + 1 == snapshot_at:
+            future.result()
+            store.snapshot()
+    future.result()
+    # Leave the store without closing it, like a crash, so the snapshot stays behind the log
+    log_bytes = os.path.getsize(store.log_path)
+
+    with_snapshot = BookingStore(directory)
+    with_snapshot_seconds, replayed_tail = with_snapshot.recovery_seconds, with_snapshot.replayed
+    with_snapshot.close()
+    os.remove(os.path.join(directory, SNAPSHOT_NAME))
+    full = BookingStore(directory)
+    full.close()
+    return {"bookings": count, "log_mb": round(log_bytes / 2 ** 20, 1),
+            "snapshot_recovery_seconds": round(with_snapshot_seconds, 3), "replayed_with_snapshot": replayed_tail,
+            "full_replay_seconds": round(full.recovery_seconds, 3), "replayed_without_snapshot": full.replayed}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Booking store group commit throughput and recovery time")
+    parser.add_argument("--directory", default=None, help="where to write the logs (default: a temporary folder)")
+    parser.add_argument("--bookings", type=int, default=20000, help="bookings per throughput run")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 64, 256])
+    parser.add_argument("--clients", type=int, default=64, help="concurrent booking threads")
+    parser.add_argument("--recovery-bookings", type=int, default=1000000)
+    parser.add_argument("--tail", type=float, default=0.1, help="fraction of the log written after the last snapshot")
+    args = parser.parse_args(argv)
+
+    directory = args.directory or tempfile.mkdtemp(prefix="booking_store_")
+    try:
+        bookings = make_bookings(args.bookings)
+        for batch_size in args.batch_sizes:
+            print(throughput(os.path.join(directory, "throughput"), bookings, batch_size, args.clients))
+        if args.recovery_bookings:
+            print(recovery(os.path.join(directory, "recovery"), args.recovery_bookings, args.tail))
+    finally:
+        if args.directory is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
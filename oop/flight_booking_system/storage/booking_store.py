@@ -0,0 +1,246 @@
+# storage/booking_store.py
+import base64
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from booking.booking import Booking
+from flight.flight import Flight
+from flight.seat_map import Cabin, SeatMap
+
+LOG_NAME = "bookings.log"
+SNAPSHOT_NAME = "snapshot.json"
+
+# Queue markers for the writer thread
+_SNAPSHOT = object()
+_STOP = object()
+
+def flight_key(flight: Flight) -> str:
+    # Flight numbers repeat every day, the departure time makes the key unique
+    return f"{flight.flight_number} {flight.departure:%Y-%m-%d %H:%M}"
+
+def booking_record(booking: Booking, booking_id: int) -> dict:
+    meal = booking.meal_option
+    return {
+        "id": booking_id,
+        "flight": flight_key(booking.flight),
+        "seats": 1,
+        "seat_number": booking.seat_number,
+        "customer": [booking.customer.name, booking.customer.contact_info, booking.customer.passport_number],
+        "meal": [meal.name, meal.price] if meal else None,
+        "services": [[service.name, service.price] for service in booking.additional_services],
+        "total": booking.total_price,
+    }
+
+class BookingStore:
+    """Append-only booking log with group commit and snapshots, kept in one directory.
+
+    Every booking is one JSON line in ``bookings.log``. A single writer thread takes all bookings queued
+    since its last write (up to ``batch_size``), writes them together and makes them durable with one
+    fsync, so concurrent bookings share the cost of the fsync. Callers get a Future that completes once
+    their booking is on disk. When a write or fsync fails, the batch is cut off the log again and its
+    Futures fail; if the log cannot be cut back, every later booking fails too.
+
+    The snapshot holds the seats sold per flight, the sold seats of flights with a seat map as their
+    ``SeatMap.to_bytes`` (a fixed size per flight, however many bookings it has), the next booking id and
+    the log offset it covers. It is rewritten every ``snapshot_every`` bookings and
+    on close, so opening the store replays only the log written after it. The bookings themselves stay in the log, see ``iter_bookings``.
+    """
+
+    def __init__(self, directory: str, batch_size: int = 256, snapshot_every: int = 100000, fsync: bool = True):
+        os.makedirs(directory, exist_ok=True)
+        self.log_path = os.path.join(directory, LOG_NAME)
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_NAME)
+        self.batch_size = batch_size
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.seats_sold = {}
+        # flight key -> SeatMap of the flight's layout with every seat sold taken, for flights with a seat map
+        self.seat_maps = {}
+        # flight key -> [base64 seat map bytes or None, seat numbers sold after them], read back from disk
+        # for flights whose layout is not known yet; turned into a SeatMap by restore_seats or the next booking
+        self.unplaced = {}
+        self.next_id = 1
+        self.since_snapshot = 0
+        self.batches = 0
+        # Set when a failed write could not be cut off the log, every later booking fails with it
+        self.failed = None
+
+        self.recover()
+        self.log = open(self.log_path, "ab")
+        # End of the last batch that made it to disk
+        self.offset = self.log.tell()
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self._write_loop, name="booking-store", daemon=True)
+        self.writer.start()
+
+    def recover(self):
+        """Load the snapshot and replay the log after it; a torn last line from a crash is cut off."""
+        start = time.perf_counter()
+        offset = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as file:
+                snapshot = json.load(file)
+            offset = snapshot["offset"]
+            self.next_id = snapshot["next_id"]
+            self.seats_sold = snapshot["seats_sold"]
+            self.unplaced = {key: [data, []] for key, data in snapshot.get("seat_maps", {}).items()}
+            self.unplaced.update(snapshot.get("unplaced", {}))
+            # Snapshots written before the seat maps were stored list the seat numbers
+            for key, seat_numbers in snapshot.get("seat_numbers", {}).items():
+                self.unplaced[key] = [None, seat_numbers]
+        self.replayed = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb+") as file:
+                file.seek(offset)
+                good = offset
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    self._apply(record)
+                    self.next_id = max(self.next_id, record["id"] + 1)
+                    good += len(line)
+                    self.replayed += 1
+                file.truncate(good)
+        self.recovery_seconds = time.perf_counter() - start
+
+    def submit(self, booking: Booking) -> Future:
+        """Queue a booking for the next group commit; the Future's result is its booking id once durable."""
+        future = Future()
+        with self.lock:
+            # Ids are handed out in queue order, so the log is always sorted by id
+            booking_id = self.next_id
+            self.next_id += 1
+            line = json.dumps(booking_record(booking, booking_id), separators=(",", ":")).encode() + b"\n"
+            self.queue.put((line, booking, booking_id, future))
+        return future
+
+    def record_booking(self, booking: Booking) -> int:
+        return self.submit(booking).result()
+
+    def snapshot(self):
+        # Taken by the writer thread between two batches, where the state matches the log exactly
+        future = Future()
+        self.queue.put((_SNAPSHOT, future))
+        future.result()
+
+    def restore_seats(self, flights: list[Flight]):
+        """Take the seats sold in earlier runs off a freshly built schedule."""
+        for flight in flights:
+            key = flight_key(flight)
+            sold = self.seats_sold.get(key, 0)
+            if getattr(flight, "seat_map", None) is None:
+                flight.available_seats -= sold
+                continue
+            seat_numbers = []
+            if key in self.seat_maps or key in self.unplaced:
+                seat_numbers = self._seat_map(key, flight.seat_map.cabins).taken()
+                flight.take_seats(seat_numbers)
+            # Bookings made before the flight had a seat map get the first free seats
+            if sold > len(seat_numbers):
+                flight.take_seats(flight.seat_map.find_free(sold - len(seat_numbers)))
+
+    def iter_bookings(self):
+        with open(self.log_path, "rb") as file:
+            for line in file:
+                yield json.loads(line)
+
+    def close(self):
+        self.queue.put((_STOP, None))
+        self.writer.join()
+        self._snapshot()
+        self.log.close()
+
+    def _write_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size and batch[-1][0] not in (_SNAPSHOT, _STOP):
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            marker = batch[-1] if batch[-1][0] in (_SNAPSHOT, _STOP) else None
+            if marker is not None:
+                batch.pop()
+            if batch:
+                self._commit(batch)
+            if marker is not None:
+                if marker[0] is _STOP:
+                    return
+                self._snapshot()
+                marker[1].set_result(None)
+
+    def _commit(self, batch):
+        if self.failed is not None:
+            for line, booking, booking_id, future in batch:
+                future.set_exception(self.failed)
+            return
+        try:
+            self.log.write(b"".join(line for line, booking, booking_id, future in batch))
+            self.log.flush()
+            if self.fsync:
+                os.fsync(self.log.fileno())
+        except OSError as error:
+            # The failed lines must not reach the log later, neither from the buffer nor from a partial write
+            try:
+                self._rewind()
+            except OSError as rewind_error:
+                self.failed = rewind_error
+            for line, booking, booking_id, future in batch:
+                future.set_exception(error)
+            return
+        self.offset = self.log.tell()
+        self.batches += 1
+        for line, booking, booking_id, future in batch:
+            key = flight_key(booking.flight)
+            self.seats_sold[key] = self.seats_sold.get(key, 0) + 1
+            if booking.seat_number:
+                self._seat_map(key, booking.flight.seat_map.cabins).take([booking.seat_number])
+            future.set_result(booking_id)
+        self.since_snapshot += len(batch)
+        if self.snapshot_every and self.since_snapshot >= self.snapshot_every:
+            self._snapshot()
+
+    def _rewind(self):
+        # Closing flushes whatever the buffer still holds, the truncation cuts it off again
+        try:
+            self.log.close()
+        except OSError:
+            pass
+        os.truncate(self.log_path, self.offset)
+        self.log = open(self.log_path, "ab")
+
+    def _snapshot(self):
+        snapshot = {"offset": self.offset, "next_id": self.next_id, "seats_sold": self.seats_sold,
+                    "seat_maps": {key: base64.b64encode(seat_map.to_bytes()).decode("ascii") for key, seat_map in self.seat_maps.items()},
+                    "unplaced": self.unplaced}
+        temporary = self.snapshot_path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(snapshot, file)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        os.replace(temporary, self.snapshot_path)
+        self.since_snapshot = 0
+
+    def _apply(self, record):
+        self.seats_sold[record["flight"]] = self.seats_sold.get(record["flight"], 0) + record["seats"]
+        if record.get("seat_number"):
+            self.unplaced.setdefault(record["flight"], [None, []])[1].append(record["seat_number"])
+
+    def _seat_map(self, key: str, cabins: list[Cabin]) -> SeatMap:
+        # Called with the flight's layout, which is needed to decode what was read back for it
+        seat_map = self.seat_maps.get(key)
+        if seat_map is None:
+            data, seat_numbers = self.unplaced.pop(key, (None, []))
+            seat_map = SeatMap.from_bytes(cabins, base64.b64decode(data)) if data else SeatMap(cabins)
+            seat_map.take(seat_numbers)
+            self.seat_maps[key] = seat_map
+        return seat_map
@@ -6,9 +6,11 @@ from airline.airline import Airline
 from flight.flight_search import FlightSearch
 from customer.customer import Customer
 from booking.booking_service import BookingService
-from services.meal_option import MealOption
+from storage.booking_store import BookingStore
 from services.additional_service import AdditionalService
+from services.price_catalogue import DEFAULT_CATALOGUE, FareQuoter
 from flight.flight import Flight
+from flight.seat_map import NARROW_BODY, SeatMap
 
 class MainUI:
     def __init__(self):
@@ -33,15 +35,21 @@ class MainUI:
         self.airline1 = Airline("Delta Airlines", "DL")
         self.airline2 = Airline("United Airlines", "UA")
         
+        # Each flight has its own seat map, so every booking gets a seat number
         self.flights = [
-            Flight("DL100", self.airline1, self.airport1, self.airport2, "2024-09-01 08:00", "2024-09-01 11:00", 300.0, 10),
-            Flight("UA200", self.airline2, self.airport1, self.airport2, "2024-09-01 09:00", "2024-09-01 12:00", 320.0, 5)
+            Flight("DL100", self.airline1, self.airport1, self.airport2, "2024-09-01 08:00", "2024-09-01 11:00", 300.0, 10, SeatMap(NARROW_BODY)),
+            Flight("UA200", self.airline2, self.airport1, self.airport2, "2024-09-01 09:00", "2024-09-01 12:00", 320.0, 5, SeatMap(NARROW_BODY))
         ]
         for flight in self.flights:
             flight.airline.add_flight(flight)
 
+        # Bookings from earlier sessions are kept on disk, their seats are taken off the schedule
+        self.booking_store = BookingStore("booking_data")
+        self.booking_store.restore_seats(self.flights)
+
         self.flight_search = FlightSearch([self.airline1, self.airline2])
-        self.booking_service = BookingService()
+        self.booking_service = BookingService(store=self.booking_store)
+        self.fare_quoter = FareQuoter(DEFAULT_CATALOGUE)
 
     def setup_styles(self):
         # Add custom styles
@@ -94,7 +102,7 @@ class MainUI:
         ttk.Entry(frame, textvariable=self.contact_info_var, style='TEntry').grid(row=3, column=1, pady=(5, 5), padx=(0, 10))
         ttk.Entry(frame, textvariable=self.passport_number_var, style='TEntry').grid(row=4, column=1, pady=(5, 5), padx=(0, 10))
 
-        meal_options = ["None", "Vegetarian", "Non-Vegetarian"]
+        meal_options = ["None"] + list(DEFAULT_CATALOGUE.meals)
         self.meal_option_var.set(meal_options[0])
         OptionMenu(frame, self.meal_option_var, *meal_options).grid(row=5, column=1, pady=(5, 5), padx=(0, 10))
 
@@ -115,7 +123,10 @@ class MainUI:
         available_flights = self.flight_search.search_flights(departure_airport, arrival_airport)
         
         if available_flights:
-            flight_info = "\n".join([f"{flight.flight_number} - {flight.departure_time} to {flight.arrival_time}, ${flight.price}" for flight in available_flights])
+            # Totals with the meal currently selected, quoted for all flights at once
+            meal_option = self.meal_option_var.get()
+            totals = self.fare_quoter.quote(available_flights, [(meal_option, [])])[:, 0]
+            flight_info = "\n".join([f"{flight.flight_number} - {flight.departure_time} to {flight.arrival_time}, ${total}" for flight, total in zip(available_flights, totals)])
             messagebox.showinfo("Available Flights", flight_info)
         else:
             messagebox.showinfo("No Flights", "No flights available for the selected route.")
@@ -132,14 +143,17 @@ class MainUI:
             # In a real application, you would allow the user to select a specific flight
             selected_flight = self.flights[0]  # Just select the first available flight for simplicity
 
-            meal = None if meal_option == "None" else MealOption(meal_option, 20.0)
+            meal = DEFAULT_CATALOGUE.meal(meal_option)
             additional_services = []  # Add logic to select additional services if needed
 
             booking = self.booking_service.make_booking(customer, selected_flight, meal, additional_services)
-            messagebox.showinfo("Booking Confirmed", f"Booking confirmed for {booking.customer.name} on flight {booking.flight.flight_number} with total price {booking.total_price}")
+            messagebox.showinfo("Booking Confirmed", f"Booking confirmed for {booking.customer.name} on flight {booking.flight.flight_number}, seat {booking.seat_number}, with total price {booking.total_price}")
         except Exception as e:
             messagebox.showerror("Booking Error", str(e))
 
     def run(self):
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.booking_store.close()
 